@@ -0,0 +1,112 @@
+"""
+Latency of GET /api/jobs/{job_id} while other threads keep writing job updates.
+
+    python benchmarks/db_benchmark.py --readers 32 --writers 4 --duration 10
+    SQLITE_JOURNAL_MODE=DELETE python benchmarks/db_benchmark.py   # compare with rollback journal
+
+Requests go through the ASGI app in-process, so the numbers include any time
+the event loop spends blocked on the database. Results are printed and, with
+--output, saved as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def writer(stop: threading.Event, job_ids, counter, interval):
+    from task_queue import update_job_status
+    statuses = ["queued", "processing", "completed"]
+    while not stop.wait(interval):
+        update_job_status(random.choice(job_ids), random.choice(statuses))
+        counter[0] += 1
+
+async def reader(client, job_ids, deadline, latencies):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get(f"/api/jobs/{random.choice(job_ids)}")
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+
+async def run(args):
+    import httpx
+    import db
+    import main
+    
+    db.init_db()
+    job_ids = [str(uuid.uuid4()) for _ in range(args.jobs)]
+    with db.connect() as conn:
+        conn.executemany(
+            "INSERT INTO jobs (job_id, original_filename, status, timestamp) VALUES (?, 'bench.pdf', 'queued', ?)",
+            [(job_id, "2024-01-01T00:00:00") for job_id in job_ids]
+        )
+    
+    stop = threading.Event()
+    writes = [0]
+    threads = [threading.Thread(target=writer, args=(stop, job_ids, writes, 1 / args.write_rate)) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*(reader(client, job_ids, deadline, latencies) for _ in range(args.readers)))
+    
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    return {
+        "journal_mode": db.SQLITE_JOURNAL_MODE,
+        "readers": args.readers,
+        "writers": args.writers,
+        "duration_seconds": args.duration,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / args.duration, 1),
+        "writes_per_second": round(writes[0] / args.duration, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2),
+            "mean": round(statistics.mean(latencies), 2),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=32, help="Concurrent pollers")
+    parser.add_argument("--writers", type=int, default=4, help="Threads writing status updates")
+    parser.add_argument("--write-rate", type=float, default=100.0, help="Updates per second per writer")
+    parser.add_argument("--jobs", type=int, default=1000, help="Jobs seeded into the database")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix="db-bench-")
+    os.environ.setdefault("DATABASE_FILE", os.path.join(workdir, "jobs.db"))
+    os.environ["RUN_WORKERS"] = "false"
+    os.chdir(workdir)
+    
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
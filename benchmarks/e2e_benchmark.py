@@ -0,0 +1,233 @@
+"""
+End-to-end benchmark: upload a synthetic PDF corpus to a real API process
+and wait for every job to finish.
+
+    python benchmarks/e2e_benchmark.py --jobs 200 --concurrency 16 --workers 8 --output e2e.json
+    python benchmarks/e2e_benchmark.py --pages 1,50,200 --delay-max 2   # scaled-down simulated delay
+
+The API runs under uvicorn in a child process with its own temporary
+database and upload directory, its embedded workers, and GitHub pointed at
+a local stub server (benchmarks/github_stub.py). The simulated delay is off
+unless --delay-min/--delay-max are given.
+
+Reported: upload latency percentiles, end-to-end job latency percentiles
+(upload start to the job's "completed" event in job_events) and completed
+jobs per second. Results are printed and, with --output, saved as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCHMARKS_DIR.parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from github_stub import GitHubStub
+from pdf_corpus import POSITIONS, generate_corpus, parse_int_list
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(values_ms):
+    if not values_ms:
+        return None
+    return {
+        "p50": round(percentile(values_ms, 50), 2),
+        "p95": round(percentile(values_ms, 95), 2),
+        "p99": round(percentile(values_ms, 99), 2),
+        "max": round(max(values_ms), 2),
+        "mean": round(statistics.mean(values_ms), 2),
+    }
+
+def start_api(args, workdir: Path, github_url: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_FILE=str(workdir / "jobs.db"),
+        UPLOAD_DIR=str(workdir / "uploads"),
+        GITHUB_API_URL=github_url,
+        RUN_WORKERS="true",
+        WORKER_CONCURRENCY=str(args.workers),
+        SIMULATED_DELAY_MIN=str(args.delay_min),
+        SIMULATED_DELAY_MAX=str(args.delay_max),
+        MEMBER_CACHE_PERSIST="false",
+    )
+    if args.extraction_processes:
+        env["EXTRACTION_PROCESSES"] = str(args.extraction_processes)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--log-level", "warning"],
+        cwd=REPO_DIR, env=env,
+        stdout=None if args.verbose else subprocess.DEVNULL,
+    )
+
+async def wait_until_ready(client, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API exited with status {process.returncode}")
+        try:
+            response = await client.get("/api/queue/status")
+            if response.status_code == 200 and response.json()["worker_running"]:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API did not become ready")
+
+async def upload_all(client, corpus, concurrency):
+    """Upload every document, at most concurrency at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    uploads = []
+
+    async def upload(document):
+        async with semaphore:
+            started = time.time()
+            response = await client.post(
+                "/api/documents/upload",
+                files={"file": (document["filename"], document["content"], "application/pdf")},
+            )
+            elapsed = time.time() - started
+            response.raise_for_status()
+            uploads.append({"job_id": response.json()["job_id"], "started": started, "latency": elapsed,
+                            "document": document})
+
+    await asyncio.gather(*(upload(document) for document in corpus))
+    return uploads
+
+async def wait_for_jobs(client, job_ids, timeout):
+    """Poll batch status until no job is queued, processing or deferred."""
+    deadline = time.monotonic() + timeout
+    pending = list(job_ids)
+    statuses = {}
+    while pending and time.monotonic() < deadline:
+        for start in range(0, len(pending), 1000):
+            response = await client.post("/api/jobs/batch-status", json={"job_ids": pending[start:start + 1000]})
+            response.raise_for_status()
+            for job in response.json()["jobs"]:
+                statuses[job["job_id"]] = job
+        pending = [job_id for job_id in pending if statuses[job_id]["status"] in ("queued", "processing", "deferred")]
+        if pending:
+            await asyncio.sleep(0.1)
+    return statuses, pending
+
+def finish_times(database: Path):
+    """When each job reached a final status, from the job_events log."""
+    conn = sqlite3.connect(database)
+    try:
+        return {
+            job_id: (status, created_at)
+            for job_id, status, created_at in conn.execute(
+                """SELECT job_id, status, MAX(created_at) FROM job_events
+                   WHERE status IN ('completed', 'failed') GROUP BY job_id"""
+            )
+        }
+    finally:
+        conn.close()
+
+async def run(args, workdir: Path):
+    import httpx
+
+    corpus = list(generate_corpus(args.jobs, args.pages, args.positions, args.orgs))
+    stub = GitHubStub(members=args.members, latency=args.github_latency).start()
+    process = start_api(args, workdir, stub.url)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency + 4)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60, limits=limits) as client:
+            await wait_until_ready(client, process)
+
+            started = time.time()
+            uploads = await upload_all(client, corpus, args.concurrency)
+            upload_seconds = time.time() - started
+            statuses, pending = await wait_for_jobs(client, [upload["job_id"] for upload in uploads], args.timeout)
+            queue_status = (await client.get("/api/queue/status")).json()
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+        stub.shutdown()
+
+    finished = finish_times(workdir / "jobs.db")
+    job_latencies = []
+    by_position = {}
+    for upload in uploads:
+        status, finished_at = finished.get(upload["job_id"], (None, None))
+        if status != "completed":
+            continue
+        latency = (finished_at - upload["started"]) * 1000
+        job_latencies.append(latency)
+        by_position.setdefault(upload["document"]["position"], []).append(latency)
+
+    last_finish = max((finished_at for _, finished_at in finished.values()), default=started)
+    wall_seconds = max(last_finish - started, 1e-9)
+    outcomes = {}
+    for job in statuses.values():
+        outcomes[job["status"]] = outcomes.get(job["status"], 0) + 1
+
+    return {
+        "config": {
+            "jobs": args.jobs,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "extraction_processes": args.extraction_processes or os.cpu_count(),
+            "pages": args.pages,
+            "positions": args.positions,
+            "orgs": args.orgs,
+            "members_per_org": args.members,
+            "github_latency_seconds": args.github_latency,
+            "simulated_delay_seconds": [args.delay_min, args.delay_max],
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "outcomes": outcomes,
+        "unfinished": len(pending),
+        "upload_seconds": round(upload_seconds, 3),
+        "uploads_per_second": round(len(uploads) / upload_seconds, 1),
+        "upload_latency_ms": summarize([upload["latency"] * 1000 for upload in uploads]),
+        "job_latency_ms": summarize(job_latencies),
+        "job_latency_ms_by_position": {
+            position: summarize(latencies) for position, latencies in sorted(by_position.items())
+        },
+        "wall_seconds": round(wall_seconds, 3),
+        "jobs_per_second": round(len(job_latencies) / wall_seconds, 2),
+        "github_requests": stub.requests,
+        "github_not_modified": stub.not_modified,
+        "queue_status": {key: queue_status.get(key) for key in ("timings", "member_cache", "extraction_methods")},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=100, help="Documents to upload")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent uploads")
+    parser.add_argument("--workers", type=int, default=4, help="WORKER_CONCURRENCY of the API")
+    parser.add_argument("--extraction-processes", type=int, default=None, help="EXTRACTION_PROCESSES of the API")
+    parser.add_argument("--pages", type=parse_int_list, default=[1, 10, 50], help="Comma-separated page counts")
+    parser.add_argument("--positions", type=lambda value: [p for p in value.split(",") if p],
+                        default=list(POSITIONS), help="Comma-separated org positions: " + ",".join(POSITIONS))
+    parser.add_argument("--orgs", type=int, default=10, help="Distinct organizations in the corpus")
+    parser.add_argument("--members", type=int, default=250, help="Members per organization on the stub")
+    parser.add_argument("--github-latency", type=float, default=0.0, help="Seconds the stub waits per request")
+    parser.add_argument("--delay-min", type=float, default=0.0, help="SIMULATED_DELAY_MIN of the API")
+    parser.add_argument("--delay-max", type=float, default=0.0, help="SIMULATED_DELAY_MAX of the API")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for jobs to finish")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the API under test")
+    parser.add_argument("--verbose", action="store_true", help="Show the API's output")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="e2e-bench-"))
+    results = asyncio.run(run(args, workdir))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
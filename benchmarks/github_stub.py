@@ -0,0 +1,106 @@
+"""
+Local stand-in for the GitHub public members API, for benchmarks.
+
+Serves /orgs/<org>/public_members with Link pagination and per-page ETags
+(answering If-None-Match with 304) like the real API. Every organization
+has the same number of members; "missing" returns 404.
+
+    python benchmarks/github_stub.py --port 8765 --members 250 --latency 0.05
+    GITHUB_API_URL=http://127.0.0.1:8765 uvicorn main:app
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MEMBERS_PATH = re.compile(r"^/orgs/([^/]+)/public_members$")
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        url = urlparse(self.path)
+        match = MEMBERS_PATH.match(url.path)
+        with server.lock:
+            server.requests += 1
+        if not match or match.group(1) == "missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        org = match.group(1)
+        query = parse_qs(url.query)
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        last = max(1, -(-server.members // per_page))
+        etag = f'"{org}-{page}-{per_page}-{server.members}"'
+
+        if self.headers.get("If-None-Match") == etag:
+            with server.lock:
+                server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start = (page - 1) * per_page
+        body = json.dumps([
+            {"login": f"{org}-member-{index}"} for index in range(start, min(server.members, start + per_page))
+        ]).encode()
+        self.send_response(200)
+        base = f"http://{self.headers.get('Host')}{url.path}"
+        links = []
+        if page < last:
+            links.append(f'<{base}?per_page={per_page}&page={page + 1}>; rel="next"')
+            links.append(f'<{base}?per_page={per_page}&page={last}>; rel="last"')
+        if links:
+            self.send_header("Link", ", ".join(links))
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class GitHubStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, members: int = 250, latency: float = 0.0):
+        super().__init__(("127.0.0.1", port), _StubHandler)
+        self.members = members
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self) -> "GitHubStub":
+        threading.Thread(target=self.serve_forever, name="github-stub", daemon=True).start()
+        return self
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--members", type=int, default=250, help="Public members per organization")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    args = parser.parse_args()
+
+    stub = GitHubStub(args.port, args.members, args.latency)
+    print(f"GitHub stub listening on {stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Synthetic PDF corpus for benchmarks.
+
+Documents vary in page count and in where the GitHub organization appears:
+as a link annotation, in the text of the first, middle or last page, or not
+at all. Every document carries a unique serial number so uploads are never
+deduplicated against each other.
+
+    python benchmarks/pdf_corpus.py --count 50 --pages 1,10,50 --output corpus/
+"""
+import argparse
+import itertools
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+POSITIONS = ("link", "first", "middle", "last", "none")
+
+FILLER = (
+    "Quarterly engineering report. Throughput improved across all services.",
+    "The platform team migrated the remaining batch jobs to the new scheduler.",
+    "Open issues were triaged weekly and the backlog shrank by a third.",
+    "Contact the maintainers through the usual channels for access requests.",
+)
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _content_stream(lines: Sequence[str]) -> bytes:
+    commands = ["BT", "/F1 11 Tf", "14 TL", "72 720 Td"]
+    for line in lines:
+        commands.append(f"({_escape(line)}) Tj T*")
+    commands.append("ET")
+    return "\n".join(commands).encode("latin-1")
+
+def build_pdf(pages: Sequence[Sequence[str]], link: Optional[str] = None) -> bytes:
+    """
+    Write a minimal PDF with one Helvetica text page per entry of pages
+    (each a list of lines). link adds a URI link annotation to page one.
+    """
+    count = len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(count)) +
+        b"] /Count %d >>" % count,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for index, lines in enumerate(pages):
+        annots = b""
+        if link and index == 0:
+            annots = (b" /Annots [<< /Type /Annot /Subtype /Link /Rect [72 72 300 90]"
+                      b" /A << /S /URI /URI (" + link.encode("latin-1") + b") >> >>]")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]"
+            b" /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R%s >>" % (5 + 2 * index, annots)
+        )
+        stream = _content_stream(lines)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def make_document(serial: int, page_count: int, position: str, org: str, lines_per_page: int = 30) -> bytes:
+    """One corpus document; position is one of POSITIONS."""
+    pages = []
+    for page in range(page_count):
+        lines = [f"Document {serial}, page {page + 1} of {page_count}"]
+        lines.extend(FILLER[(page + line) % len(FILLER)] for line in range(lines_per_page - 1))
+        pages.append(lines)
+
+    target = {"first": 0, "middle": page_count // 2, "last": page_count - 1}.get(position)
+    if target is not None:
+        pages[target].insert(len(pages[target]) // 2, f"Source code: github.com/orgs/{org}/ on GitHub")
+    link = f"https://github.com/{org}" if position == "link" else None
+    return build_pdf(pages, link)
+
+def generate_corpus(count: int, page_counts: Sequence[int], positions: Sequence[str] = POSITIONS,
+                    orgs: int = 10) -> Iterator[Dict]:
+    """
+    Yield count documents cycling through every combination of page count
+    and org position, spread over orgs distinct organizations. Each item is
+    a dict with filename, content, pages, position and org (None when the
+    document names no organization).
+    """
+    combinations = itertools.cycle(itertools.product(page_counts, positions))
+    for serial in range(count):
+        pages, position = next(combinations)
+        org = f"bench-org-{serial % orgs}"
+        yield {
+            "filename": f"doc-{serial:05d}-{pages}p-{position}.pdf",
+            "content": make_document(serial, pages, position, org),
+            "pages": pages,
+            "position": position,
+            "org": None if position == "none" else org,
+        }
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=50, help="Documents to generate")
+    parser.add_argument("--pages", type=parse_int_list, default=[1, 10, 50], help="Comma-separated page counts")
+    parser.add_argument("--positions", default=",".join(POSITIONS), help="Comma-separated org positions")
+    parser.add_argument("--orgs", type=int, default=10, help="Distinct organizations")
+    parser.add_argument("--output", default="corpus", help="Directory to write the PDFs to")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    positions = [position for position in args.positions.split(",") if position]
+    for document in generate_corpus(args.count, args.pages, positions, args.orgs):
+        (output / document["filename"]).write_bytes(document["content"])
+    print(f"Wrote {args.count} PDFs to {output}")
+
+if __name__ == "__main__":
+    main()
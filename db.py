@@ -0,0 +1,411 @@
+import asyncio
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, TypeVar
+
+# Database configuration, shared by the API, the workers and the caches
+DATABASE_FILE = os.getenv("DATABASE_FILE", "jobs.db")
+# WAL lets readers proceed while a writer commits; use DELETE on network
+# filesystems, where WAL's shared memory index does not work
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_MS = 30000
+
+T = TypeVar("T")
+
+def _open_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(DATABASE_FILE, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    # With WAL, NORMAL only syncs at checkpoints: commits stay durable across
+    # application crashes and are much cheaper than FULL
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA cache_size = -16000")  # 16 MB page cache per connection
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA mmap_size = 134217728")  # 128 MB
+    return conn
+
+class ConnectionPool:
+    """Keeps up to `size` open connections for reuse across threads."""
+
+    def __init__(self, size: int):
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def acquire(self) -> sqlite3.Connection:
+        self._check_fork()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return _open_connection()
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _check_fork(self):
+        # Connections must never be shared with a forked child
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = queue.LifoQueue(maxsize=self._idle.maxsize)
+                    self._pid = os.getpid()
+
+_pool = ConnectionPool(DB_POOL_SIZE)
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    """
+    Borrow a pooled connection. Commits when the block succeeds and rolls
+    back when it raises.
+    """
+    conn = _pool.acquire()
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        _pool.release(conn)
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Borrow a pooled connection inside BEGIN IMMEDIATE, for read-then-write
+    sequences that must not interleave with other writers.
+    """
+    with connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+async def run(fn: Callable[..., T], *args: Any) -> T:
+    """Run a blocking database function on the database thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, fn, *args)
+
+def close():
+    """Close all idle pooled connections."""
+    _pool.close()
+
+def init_db(upload_dir: Path = Path("uploads")):
+    """Create the schema and migrate databases created by older versions."""
+    with connect() as conn:
+        _create_schema(conn, upload_dir)
+
+def _create_schema(conn: sqlite3.Connection, upload_dir: Path):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            original_filename TEXT NOT NULL,
+            extracted_company_username TEXT,
+            github_members TEXT,
+            status TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )
+    """)
+    # Columns added after the initial schema
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+    if "content_hash" not in columns:
+        conn.execute("ALTER TABLE jobs ADD COLUMN content_hash TEXT")
+    if "duplicate_of" not in columns:
+        conn.execute("ALTER TABLE jobs ADD COLUMN duplicate_of TEXT")
+    # Durable queue bookkeeping (see task_queue.claim_task)
+    for column, definition in [
+        ("file_path", "TEXT"),
+        ("enqueued_at", "REAL"),
+        ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+        ("lease_owner", "TEXT"),
+        ("lease_expires_at", "REAL"),
+        ("version", "INTEGER NOT NULL DEFAULT 1"),
+        ("started_at", "REAL"),
+        ("priority", "INTEGER NOT NULL DEFAULT 0"),
+        ("client_id", "TEXT NOT NULL DEFAULT ''"),
+        ("page_count", "INTEGER"),
+        ("available_at", "REAL"),
+        ("deferrals", "INTEGER NOT NULL DEFAULT 0"),
+        ("org_id", "INTEGER"),
+        ("members_snapshot_id", "INTEGER"),
+        ("cancel_requested", "INTEGER NOT NULL DEFAULT 0"),
+    ]:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+    # Jobs queued before the queue was persistent: their file is still in uploads/
+    conn.execute(
+        """UPDATE jobs SET file_path = ? || '/' || job_id || '.pdf', enqueued_at = 0
+           WHERE file_path IS NULL AND duplicate_of IS NULL AND status IN ('queued', 'processing')""",
+        (str(upload_dir),)
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, enqueued_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_schedule ON jobs (status, priority, client_id, enqueued_at)")
+    # When each client last had a job claimed, for round-robin between clients
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS client_turns (
+            client_id TEXT PRIMARY KEY,
+            served_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_content_hash ON jobs (content_hash, status)")
+    # Keyset pagination of GET /api/jobs, and retention by age
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_listing ON jobs (timestamp, job_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_listing ON jobs (status, timestamp, job_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_duplicate_of ON jobs (duplicate_of)")
+    # Every change to what GET /api/jobs/{job_id} returns bumps the job's
+    # version (its ETag); a trigger from an older version that watches fewer
+    # columns is replaced
+    version_trigger = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_jobs_version'"
+    ).fetchone()
+    if version_trigger and "cancel_requested" not in version_trigger[0]:
+        conn.execute("DROP TRIGGER trg_jobs_version")
+    _create_orgs(conn)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_version
+        AFTER UPDATE OF status, extracted_company_username, github_members, members_snapshot_id, duplicate_of,
+            available_at, cancel_requested ON jobs
+        BEGIN
+            UPDATE jobs SET version = OLD.version + 1 WHERE job_id = NEW.job_id;
+        END
+    """)
+    # Every new version is logged by triggers, whichever process makes it;
+    # the API tails this table to push updates to subscribers and to keep
+    # its map of current job versions
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    if "version" not in {row[1] for row in conn.execute("PRAGMA table_info(job_events)")}:
+        conn.execute("ALTER TABLE job_events ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, event_id)")
+    # Event triggers from before versioning
+    conn.execute("DROP TRIGGER IF EXISTS trg_jobs_status_event")
+    insert_trigger = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_jobs_insert_event'"
+    ).fetchone()
+    if insert_trigger and "version" not in insert_trigger[0]:
+        conn.execute("DROP TRIGGER trg_jobs_insert_event")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_insert_event AFTER INSERT ON jobs
+        BEGIN
+            INSERT INTO job_events (job_id, status, version, created_at)
+            VALUES (NEW.job_id, NEW.status, NEW.version, (julianday('now') - 2440587.5) * 86400.0);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_version_event AFTER UPDATE OF version ON jobs
+        WHEN NEW.version IS NOT OLD.version
+        BEGIN
+            INSERT INTO job_events (job_id, status, version, created_at)
+            VALUES (NEW.job_id, NEW.status, NEW.version, (julianday('now') - 2440587.5) * 86400.0);
+        END
+    """)
+    _create_statistics(conn)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS workers (
+            worker_id TEXT PRIMARY KEY,
+            hostname TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            concurrency INTEGER NOT NULL,
+            busy INTEGER NOT NULL,
+            active_jobs TEXT NOT NULL,
+            stats TEXT NOT NULL,
+            heartbeat_at REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS github_rate_limits (
+            quota_key TEXT PRIMARY KEY,
+            remaining INTEGER,
+            reset_at REAL NOT NULL,
+            paused_until REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    # Last run of each periodic maintenance task, by any process (see maintenance.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            task TEXT PRIMARY KEY,
+            last_run_at REAL NOT NULL,
+            result TEXT
+        )
+    """)
+    # Timing spans (and, for slow jobs, a cProfile summary) of profiled jobs (see profiling.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_profiles (
+            job_id TEXT PRIMARY KEY,
+            started_at REAL NOT NULL,
+            total_seconds REAL NOT NULL,
+            spans TEXT NOT NULL,
+            stats TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS github_member_cache (
+            org TEXT PRIMARY KEY,
+            pages TEXT NOT NULL,
+            etags TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+    """)
+
+def _create_orgs(conn: sqlite3.Connection):
+    """
+    Organizations and deduplicated member list snapshots referenced by jobs
+    (see orgs.py). Member lists that older versions stored as JSON on each
+    job are moved into snapshots; this runs before trg_jobs_version exists
+    so the move does not count as a change to the jobs.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS orgs (
+            org_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            latest_snapshot_id INTEGER
+        )
+    """)
+    # AUTOINCREMENT: snapshots are cached by id (orgs._snapshots), so the id
+    # of a pruned snapshot must never be handed out again
+    snapshots_table = """
+        CREATE TABLE IF NOT EXISTS member_snapshots (
+            snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            org_id INTEGER NOT NULL REFERENCES orgs (org_id),
+            members_hash TEXT NOT NULL,
+            members TEXT NOT NULL,
+            member_count INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            UNIQUE (org_id, members_hash)
+        )
+    """
+    existing = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'member_snapshots'"
+    ).fetchone()
+    if existing and "AUTOINCREMENT" not in existing[0]:
+        # Snapshot tables from before AUTOINCREMENT are rebuilt with it
+        conn.execute("ALTER TABLE member_snapshots RENAME TO member_snapshots_old")
+        conn.execute(snapshots_table)
+        conn.execute(
+            """INSERT INTO member_snapshots (snapshot_id, org_id, members_hash, members, member_count, created_at)
+               SELECT snapshot_id, org_id, members_hash, members, member_count, created_at FROM member_snapshots_old"""
+        )
+        conn.execute("DROP TABLE member_snapshots_old")
+    else:
+        conn.execute(snapshots_table)
+    # Listing an organization's jobs (superseded idx_jobs_org lacked the job_id tiebreaker)
+    conn.execute("DROP INDEX IF EXISTS idx_jobs_org")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_org_listing ON jobs (org_id, timestamp, job_id)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_snapshot ON jobs (members_snapshot_id) WHERE members_snapshot_id IS NOT NULL"
+    )
+    
+    if conn.execute(
+        "SELECT 1 FROM jobs WHERE github_members IS NOT NULL OR (org_id IS NULL AND extracted_company_username IS NOT NULL) LIMIT 1"
+    ).fetchone() is None:
+        return
+    conn.create_function("sha256", 1, lambda text: hashlib.sha256(text.encode()).hexdigest(), deterministic=True)
+    conn.execute(
+        """INSERT OR IGNORE INTO orgs (username)
+           SELECT DISTINCT extracted_company_username FROM jobs WHERE extracted_company_username IS NOT NULL"""
+    )
+    conn.execute(
+        """UPDATE jobs SET org_id = (SELECT org_id FROM orgs WHERE username = jobs.extracted_company_username)
+           WHERE org_id IS NULL AND extracted_company_username IS NOT NULL"""
+    )
+    conn.execute(
+        """INSERT OR IGNORE INTO member_snapshots (org_id, members_hash, members, member_count, created_at)
+           SELECT org_id, sha256(github_members), github_members, json_array_length(github_members),
+                  (julianday('now') - 2440587.5) * 86400.0
+           FROM jobs WHERE github_members IS NOT NULL AND org_id IS NOT NULL
+           ORDER BY timestamp"""
+    )
+    conn.execute(
+        """UPDATE jobs SET members_snapshot_id = (
+               SELECT snapshot_id FROM member_snapshots s
+               WHERE s.org_id = jobs.org_id AND s.members_hash = sha256(jobs.github_members)
+           ), github_members = NULL
+           WHERE github_members IS NOT NULL AND org_id IS NOT NULL"""
+    )
+    conn.execute(
+        """UPDATE orgs SET latest_snapshot_id = (
+               SELECT MAX(snapshot_id) FROM member_snapshots s WHERE s.org_id = orgs.org_id
+           )"""
+    )
+
+def _create_statistics(conn: sqlite3.Connection):
+    """
+    Summary tables read by /api/queue/status instead of scanning jobs:
+    per-status job counts kept exact by triggers, and moving averages of
+    queue wait and processing time (see task_queue.record_timing).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_status_counts (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_timings (
+            metric TEXT PRIMARY KEY,
+            average REAL NOT NULL,
+            samples INTEGER NOT NULL
+        )
+    """)
+    counted = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_jobs_count_insert'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_count_insert AFTER INSERT ON jobs
+        BEGIN
+            INSERT INTO job_status_counts (status, count) VALUES (NEW.status, 1)
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_count_status AFTER UPDATE OF status ON jobs
+        WHEN NEW.status IS NOT OLD.status
+        BEGIN
+            UPDATE job_status_counts SET count = count - 1 WHERE status = OLD.status;
+            INSERT INTO job_status_counts (status, count) VALUES (NEW.status, 1)
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_count_delete AFTER DELETE ON jobs
+        BEGIN
+            UPDATE job_status_counts SET count = count - 1 WHERE status = OLD.status;
+        END
+    """)
+    if not counted:
+        # Jobs inserted before the triggers existed
+        reconcile_status_counts(conn)
+
+def reconcile_status_counts(conn: sqlite3.Connection):
+    """Recount job_status_counts from the jobs table (a full scan)."""
+    conn.execute("DELETE FROM job_status_counts")
+    conn.execute(
+        "INSERT INTO job_status_counts (status, count) SELECT status, COUNT(*) FROM jobs GROUP BY status"
+    )
@@ -0,0 +1,190 @@
+import asyncio
+import json
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+import db
+
+# Job status event streaming: job_events rows (written by triggers on the
+# jobs table, from any process) are tailed into an in-memory buffer and
+# fanned out to Server-Sent Events subscribers.
+EVENT_POLL_INTERVAL = 0.25
+EVENT_BUFFER_SIZE = 10000  # Recent events kept in memory for reconnecting clients
+EVENT_KEEPALIVE_SECONDS = 15.0
+EVENT_STREAM_MAX_SECONDS = 300.0  # Streams then end; clients reconnect with Last-Event-ID
+MAX_SUBSCRIBED_JOBS = 500
+JOB_VERSION_CACHE_SIZE = 100000  # Jobs whose current version is kept for conditional GETs
+
+# Events are dicts with event_id, job_id, status, version and created_at
+_buffer: Deque[Dict[str, Any]] = deque(maxlen=EVENT_BUFFER_SIZE)
+# job_id -> latest version seen, most recently used last
+_job_versions: "OrderedDict[str, int]" = OrderedDict()
+_last_event_id = 0
+_new_events = asyncio.Condition()
+_closing = asyncio.Event()  # Set on shutdown: open streams end
+_tail_task: Optional[asyncio.Task] = None
+
+def _fetch_events_after(event_id: int, limit: int = 1000) -> List[Dict[str, Any]]:
+    with db.connect() as conn:
+        rows = conn.execute(
+            """SELECT event_id, job_id, status, version, created_at FROM job_events
+               WHERE event_id > ? ORDER BY event_id LIMIT ?""",
+            (event_id, limit)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+def _fetch_job_events_after(event_id: int, job_ids: List[str]) -> List[Dict[str, Any]]:
+    placeholders = ",".join("?" * len(job_ids))
+    with db.connect() as conn:
+        rows = conn.execute(
+            f"""SELECT event_id, job_id, status, version, created_at FROM job_events
+                WHERE event_id > ? AND job_id IN ({placeholders}) ORDER BY event_id""",
+            (event_id, *job_ids)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+def _fetch_current_statuses(job_ids: List[str]) -> List[Dict[str, Any]]:
+    """Each job's latest event, i.e. its current status."""
+    placeholders = ",".join("?" * len(job_ids))
+    with db.connect() as conn:
+        rows = conn.execute(
+            f"""SELECT e.event_id, e.job_id, e.status, e.version, e.created_at
+                FROM job_events e
+                WHERE e.job_id IN ({placeholders})
+                  AND e.event_id = (SELECT MAX(event_id) FROM job_events WHERE job_id = e.job_id)
+                ORDER BY e.event_id""",
+            job_ids
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+def format_sse(event: Dict[str, Any]) -> str:
+    data = json.dumps({"job_id": event["job_id"], "status": event["status"], "created_at": event["created_at"]})
+    return f"id: {event['event_id']}\nevent: status\ndata: {data}\n\n"
+
+def remember_job_version(job_id: str, version: int):
+    """Record a job's version; versions only grow, so an older one never wins."""
+    _job_versions[job_id] = max(version, _job_versions.get(job_id, 0))
+    _job_versions.move_to_end(job_id)
+    while len(_job_versions) > JOB_VERSION_CACHE_SIZE:
+        _job_versions.popitem(last=False)
+
+def get_job_version(job_id: str) -> Optional[int]:
+    """
+    The job's current version as of the last tailed event, or None when it
+    is not tracked (the caller then has to ask the database).
+    """
+    return _job_versions.get(job_id)
+
+def _buffered_events_after(event_id: int) -> List[Dict[str, Any]]:
+    events = []
+    for event in reversed(_buffer):
+        if event["event_id"] <= event_id:
+            break
+        events.append(event)
+    events.reverse()
+    return events
+
+def _fetch_last_event_id() -> int:
+    with db.connect() as conn:
+        return conn.execute("SELECT COALESCE(MAX(event_id), 0) FROM job_events").fetchone()[0]
+
+async def _tail_events():
+    """Move new job_events rows into the buffer and wake subscribers."""
+    global _last_event_id
+    while True:
+        try:
+            events = await db.run(_fetch_events_after, _last_event_id)
+        except Exception as e:
+            print(f"Event tail error: {str(e)}")
+            events = []
+        
+        if events:
+            _buffer.extend(events)
+            for event in events:
+                remember_job_version(event["job_id"], event["version"])
+            _last_event_id = events[-1]["event_id"]
+            async with _new_events:
+                _new_events.notify_all()
+            if len(events) == 1000:
+                continue  # More waiting, don't sleep
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+async def start():
+    """Start tailing job events (events from before startup are not replayed)."""
+    global _tail_task, _last_event_id
+    _closing.clear()
+    if _tail_task is None:
+        _last_event_id = await db.run(_fetch_last_event_id)
+        _tail_task = asyncio.create_task(_tail_events())
+
+async def close():
+    """
+    End all open streams. Runs when the server starts exiting, before it
+    waits for open responses to finish; the clients reconnect elsewhere.
+    """
+    _closing.set()
+    async with _new_events:
+        _new_events.notify_all()
+
+async def stop():
+    global _tail_task
+    await close()
+    if _tail_task is not None:
+        _tail_task.cancel()
+        await asyncio.gather(_tail_task, return_exceptions=True)
+        _tail_task = None
+
+async def subscribe(job_ids: List[str], last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Yield SSE messages for status changes of the given jobs.
+    
+    A new subscriber first receives each job's current status. A client
+    reconnecting with Last-Event-ID instead receives every event it missed,
+    from the buffer or, if they are older than that, from the database.
+    The stream ends on shutdown and after EVENT_STREAM_MAX_SECONDS.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + EVENT_STREAM_MAX_SECONDS
+    # Taken before the backlog is read: events tailed meanwhile are then
+    # replayed from the buffer (duplicates are dropped below) instead of lost
+    cursor = _last_event_id
+    if last_event_id is None:
+        backlog = await db.run(_fetch_current_statuses, job_ids)
+        seen = {job_id: 0 for job_id in job_ids}
+    elif _buffer and last_event_id >= _buffer[0]["event_id"] - 1:
+        backlog = [event for event in _buffered_events_after(last_event_id) if event["job_id"] in job_ids]
+        seen = {job_id: last_event_id for job_id in job_ids}
+    else:
+        backlog = await db.run(_fetch_job_events_after, last_event_id, job_ids)
+        seen = {job_id: last_event_id for job_id in job_ids}
+    
+    yield "retry: 3000\n\n"
+    while True:
+        # Events can reach us both through the backlog query and the buffer;
+        # per-job ids make sure each is sent once and in order
+        for event in backlog:
+            if event["job_id"] in seen and event["event_id"] > seen[event["job_id"]]:
+                seen[event["job_id"]] = event["event_id"]
+                yield format_sse(event)
+        
+        # Checked under the lock so a notification cannot slip in before the
+        # wait; never yield while holding it, or a slow client stalls the tail
+        remaining = deadline - loop.time()
+        if _closing.is_set() or remaining <= 0:
+            return
+        timed_out = False
+        async with _new_events:
+            if _last_event_id <= cursor and not _closing.is_set():
+                try:
+                    await asyncio.wait_for(_new_events.wait(), timeout=min(EVENT_KEEPALIVE_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    timed_out = True
+        if _closing.is_set():
+            return
+        if timed_out:
+            yield ": keepalive\n\n"
+            backlog = []
+            continue
+        
+        backlog = _buffered_events_after(cursor)
+        cursor = _last_event_id
@@ -0,0 +1,136 @@
+import asyncio
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from pdf_processor import ExtractionResult, extract_org_from_pdf
+from profiling import profile_extraction
+
+# Extraction pool configuration
+EXTRACTION_PROCESSES = int(os.getenv("EXTRACTION_PROCESSES", str(os.cpu_count() or 1)))
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "120"))
+EXTRACTION_RETRIES = 1  # Re-runs for jobs whose child crashed
+
+_pool: Optional[ProcessPoolExecutor] = None
+# Pools killed on purpose (a job timed out or was cancelled). A child that
+# dies breaks the whole ProcessPoolExecutor, so the other jobs in flight
+# lose their children too; they are retried without using up their retries.
+_killed_pools: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+# Warm-up of replacement pools: resolves once all of their children are up
+_warmups: "weakref.WeakKeyDictionary[ProcessPoolExecutor, asyncio.Future]" = weakref.WeakKeyDictionary()
+# One slot per child. Jobs wait here rather than in the pool's own queue, so
+# a job is only submitted when a child is free to start it: its deadline
+# does not run while it waits, and cancelling it never touches the pool.
+_slots: Optional[asyncio.Semaphore] = None
+
+def _init_child():
+    """Child initializer: import pdfplumber once so jobs don't pay for it."""
+    import pdfplumber  # noqa: F401
+
+def _ping() -> int:
+    return os.getpid()
+
+def _create_pool(processes: int) -> ProcessPoolExecutor:
+    # "spawn" avoids forking a process that already runs an event loop and threads
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_child,
+    )
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = _create_pool(EXTRACTION_PROCESSES)
+    return _pool
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(EXTRACTION_PROCESSES)
+    return _slots
+
+def _discard_pool(pool: ProcessPoolExecutor, killed: bool = False):
+    """
+    Kill every child of a pool and replace it with a fresh pool, whose
+    children start warming up at once. killed marks a pool stopped on
+    purpose rather than broken by a crash.
+    """
+    global _pool
+    if killed:
+        _killed_pools.add(pool)
+    for process in list((pool._processes or {}).values()):
+        if process.is_alive():
+            process.terminate()
+    # Pending futures are failed with BrokenProcessPool by the executor, not cancelled
+    pool.shutdown(wait=False)
+    if _pool is pool:
+        _pool = _create_pool(EXTRACTION_PROCESSES)
+        _warmups[_pool] = asyncio.gather(
+            *(asyncio.wrap_future(_pool.submit(_ping)) for _ in range(EXTRACTION_PROCESSES)),
+            return_exceptions=True,
+        )
+
+async def start_pool(processes: Optional[int] = None):
+    """Create the extraction pool and pre-warm its children."""
+    global EXTRACTION_PROCESSES, _slots
+    if processes:
+        EXTRACTION_PROCESSES = processes
+    _slots = asyncio.Semaphore(EXTRACTION_PROCESSES)
+    pool = _get_pool()
+    loop = asyncio.get_running_loop()
+    pids = await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(EXTRACTION_PROCESSES)))
+    print(f"Extraction pool ready with {len(set(pids))} processes")
+
+async def stop_pool():
+    """Shut down the extraction pool."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+async def run_extraction(file_path: str, timeout: Optional[float] = None, profile: bool = False) -> ExtractionResult:
+    """
+    Run extract_org_from_pdf in the process pool without blocking the event loop
+    (under cProfile, with per-page spans, when profile is set).
+    
+    The timeout starts when a child takes the job, not while the job waits
+    for a free child (or for a restarted pool to come up). A job that
+    exceeds it, or is cancelled while a child is parsing it, has its child
+    killed (which restarts the pool); jobs that only lost their child
+    because of that are retried, as often as it happens. A job whose child
+    crashes is retried EXTRACTION_RETRIES times.
+    """
+    timeout = timeout or EXTRACTION_TIMEOUT
+    
+    crashes = 0
+    while True:
+        async with _get_slots():
+            pool = _get_pool()
+            future = None
+            try:
+                if pool in _warmups:
+                    # Shielded: a cancelled job must not cancel the warm-up others wait for
+                    await asyncio.shield(_warmups[pool])
+                future = pool.submit(profile_extraction if profile else extract_org_from_pdf, file_path)
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+            except asyncio.CancelledError:
+                if future is not None and not future.cancel() and not future.done():
+                    _discard_pool(pool, killed=True)
+                raise
+            except asyncio.TimeoutError:
+                # A job that never reached a child is just dropped; one that did may be
+                # stuck inside pdfplumber, and the only way to stop it is to kill the child
+                if not future.cancel() and not future.done():
+                    _discard_pool(pool, killed=True)
+                raise TimeoutError(f"PDF extraction exceeded {timeout:g} seconds")
+            except BrokenProcessPool:
+                if pool not in _killed_pools:
+                    _discard_pool(pool)
+                    if crashes == EXTRACTION_RETRIES:
+                        raise RuntimeError("PDF extraction process crashed")
+                    crashes += 1
+        print(f"Extraction pool restarted, retrying {file_path}")
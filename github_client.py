@@ -0,0 +1,219 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+import member_cache
+import metrics
+import profiling
+from github_rate_limit import GitHubUnavailableError, is_rate_limited, limiter
+from member_cache import CacheEntry, cache_stats
+
+# GitHub API configuration (the base URL can point at a local stub server)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GITHUB_PAGE_SIZE = 100  # Maximum page size the API allows
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "4"))
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "10"))
+# Retries of transient failures (connection errors, 5xx, rate limits) with
+# full-jitter exponential backoff; after that the job is deferred
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+GITHUB_BACKOFF_BASE = 1.0
+GITHUB_BACKOFF_MAX = 30.0
+GITHUB_RETRY_LATER_SECONDS = 60.0  # When a job is deferred after transient failures
+
+GITHUB_REQUEST_SECONDS = metrics.Histogram(
+    "github_request_duration_seconds", "GitHub API request latency by response status", ["status"]
+)
+
+# Shared keep-alive client, created lazily on the running event loop
+_client: Optional[httpx.AsyncClient] = None
+
+# In-flight member refreshes, keyed by lower-cased organization name
+_refreshes: Dict[str, "asyncio.Future[List[str]]"] = {}
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared GitHub client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=GITHUB_API_URL,
+            timeout=GITHUB_TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            headers={
+                "Accept": "application/vnd.github+json",
+                "User-Agent": "pdf-processing-api",
+            },
+        )
+    return _client
+
+async def close_client():
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
+def _is_transient(response: httpx.Response) -> bool:
+    return response.status_code >= 500 or is_rate_limited(response)
+
+async def _get(path: str, params: Dict, headers: Dict[str, str]) -> httpx.Response:
+    """
+    GET from the GitHub API through the shared rate limiter, retrying
+    transient failures. Raises GitHubUnavailableError when GitHub stays
+    unavailable (or rate limited) beyond what is worth waiting for.
+    """
+    client = get_client()
+    for attempt in range(GITHUB_MAX_RETRIES + 1):
+        quota = await limiter.acquire()
+        started = time.perf_counter()
+        try:
+            response = await client.get(path, params=params, headers={**headers, **quota.headers})
+        except httpx.TransportError as e:
+            GITHUB_REQUEST_SECONDS.observe(time.perf_counter() - started, status="error")
+            profiling.record("github_request", time.perf_counter() - started, path=path, status="error")
+            failure = f"{type(e).__name__}: {e}"
+        else:
+            GITHUB_REQUEST_SECONDS.observe(time.perf_counter() - started, status=str(response.status_code))
+            profiling.record("github_request", time.perf_counter() - started, path=path,
+                             page=params.get("page", 1), status=response.status_code)
+            await limiter.observe(quota, response)
+            if not _is_transient(response):
+                return response
+            failure = f"HTTP {response.status_code}"
+        
+        if attempt < GITHUB_MAX_RETRIES:
+            # Rate limit pauses are waited out by limiter.acquire() on the next attempt
+            delay = random.uniform(0, min(GITHUB_BACKOFF_MAX, GITHUB_BACKOFF_BASE * 2 ** attempt))
+            print(f"GitHub request {path} failed ({failure}), retrying in {delay:.1f} seconds")
+            await asyncio.sleep(delay)
+    
+    raise GitHubUnavailableError(
+        f"GitHub request {path} failed after {GITHUB_MAX_RETRIES + 1} attempts ({failure})",
+        time.time() + GITHUB_RETRY_LATER_SECONDS
+    )
+
+def _page_number(response: httpx.Response, rel: str) -> Optional[int]:
+    """Read the page number of a rel="..." entry in the Link header."""
+    link = response.links.get(rel)
+    if not link:
+        return None
+    page = httpx.URL(link["url"]).params.get("page")
+    return int(page) if page and page.isdigit() else None
+
+def _logins(response: httpx.Response) -> List[str]:
+    return [member["login"] for member in response.json()]
+
+class _Page(NamedTuple):
+    logins: List[str]
+    etag: Optional[str]
+    modified: bool  # False when GitHub answered 304 Not Modified
+    last_page: Optional[int]  # From the Link header, when present
+    has_next: bool
+
+async def _fetch_pages(org_name: str, cached: Optional[CacheEntry]) -> Tuple[CacheEntry, bool]:
+    """
+    Fetch every page of an organization's public members.
+    
+    Pages we already hold are requested with If-None-Match, so an unchanged
+    page costs a 304 (which does not count against the rate limit). After
+    the first page, the remaining ones are fetched concurrently, at most
+    GITHUB_MAX_CONCURRENCY at a time. Returns the new entry and whether
+    anything changed.
+    """
+    path = f"/orgs/{org_name}/public_members"
+    cached_pages = cached.pages if cached else []
+    cached_etags = cached.etags if cached else []
+    
+    async def fetch_page(page: int) -> Optional[_Page]:
+        index = page - 1
+        etag = cached_etags[index] if index < len(cached_etags) else None
+        headers = {"If-None-Match": etag} if etag else {}
+        response = await _get(path, {"per_page": GITHUB_PAGE_SIZE, "page": page}, headers)
+        
+        if response.status_code == 404:
+            # Organization not found or no public members
+            return None
+        if response.status_code == 304:
+            return _Page(cached_pages[index], etag, False, None, False)
+        
+        response.raise_for_status()
+        return _Page(
+            _logins(response),
+            response.headers.get("ETag"),
+            True,
+            _page_number(response, "last"),
+            "next" in response.links,
+        )
+    
+    first = await fetch_page(1)
+    if first is None:
+        return CacheEntry([], [], time.time()), bool(cached_pages)
+    
+    pages = [first]
+    last_page = first.last_page if first.modified else len(cached_pages)
+    if last_page and last_page > 1:
+        semaphore = asyncio.Semaphore(GITHUB_MAX_CONCURRENCY)
+        
+        async def bounded_fetch(page: int) -> Optional[_Page]:
+            async with semaphore:
+                return await fetch_page(page)
+        
+        pages.extend(await asyncio.gather(*(bounded_fetch(page) for page in range(2, last_page + 1))))
+    
+    # Pages can disappear (members left) or appear (members joined) since we cached them
+    pages = [page for page in pages if page is not None]
+    while pages[-1].has_next:
+        page = await fetch_page(len(pages) + 1)
+        if page is None:
+            break
+        pages.append(page)
+    
+    entry = CacheEntry(
+        pages=[page.logins for page in pages],
+        etags=[page.etag for page in pages],
+        fetched_at=time.time(),
+    )
+    modified = any(page.modified for page in pages) or len(pages) != len(cached_pages)
+    return entry, modified
+
+async def _refresh_members(org_name: str) -> List[str]:
+    cached = await member_cache.get(org_name)
+    try:
+        entry, modified = await _fetch_pages(org_name, cached)
+    except (GitHubUnavailableError, httpx.HTTPError) as e:
+        print(f"Error fetching GitHub members: {e}")
+        # Stale members are better than none when GitHub is unavailable;
+        # without them the error reaches the job (deferred or failed)
+        if cached is None:
+            raise
+        return cached.members
+    
+    cache_stats["misses" if modified or cached is None else "revalidated"] += 1
+    await member_cache.put(org_name, entry)
+    return entry.members
+
+async def fetch_members(org_name: str) -> List[str]:
+    """
+    Fetch all public members of a GitHub organization, served from the
+    members cache while the entry is within its TTL and revalidated with
+    ETags afterwards. Concurrent requests for the same organization share
+    one refresh.
+    
+    Raises GitHubUnavailableError when GitHub is rate limited or failing
+    and the organization is not cached at all.
+    """
+    cached = await member_cache.get(org_name)
+    if cached is not None and cached.is_fresh():
+        cache_stats["hits"] += 1
+        return cached.members
+    
+    key = org_name.lower()
+    refresh = _refreshes.get(key)
+    if refresh is None:
+        refresh = asyncio.ensure_future(_refresh_members(org_name))
+        _refreshes[key] = refresh
+        refresh.add_done_callback(lambda _: _refreshes.pop(key, None))
+    return list(await asyncio.shield(refresh))
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+import db
+
+# GitHub rate limits. Each token (or the anonymous client) has a quota
+# that behaves like a token bucket: GitHub reports how many requests are
+# left (X-RateLimit-Remaining) and when the bucket refills
+# (X-RateLimit-Reset). Requests are only sent while the bucket has
+# tokens; once it is empty, or GitHub sends Retry-After, every worker
+# pauses until the reset. Quota state is shared between processes through
+# the github_rate_limits table.
+GITHUB_TOKENS = [token.strip() for token in os.getenv("GITHUB_TOKEN", "").split(",") if token.strip()]
+GITHUB_MAX_RATE_LIMIT_WAIT = float(os.getenv("GITHUB_MAX_RATE_LIMIT_WAIT", "30"))  # Longer pauses defer the job
+SECONDARY_LIMIT_PAUSE = 60.0  # GitHub's advice when a secondary limit gives no Retry-After
+RATE_LIMIT_SYNC_SECONDS = 5.0
+
+class GitHubUnavailableError(Exception):
+    """GitHub cannot serve requests now (rate limited or failing); try again at retry_at."""
+    def __init__(self, message: str, retry_at: float):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    """A 429, or a 403 that GitHub sends for primary and secondary rate limits."""
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    return (
+        response.headers.get("X-RateLimit-Remaining") == "0"
+        or "Retry-After" in response.headers
+        or "rate limit" in response.text.lower()
+    )
+
+class Quota:
+    """Rate limit state of one token (token None is the anonymous client)."""
+    def __init__(self, token: Optional[str]):
+        self.token = token
+        self.key = hashlib.sha256(token.encode()).hexdigest()[:12] if token else "anonymous"
+        self.remaining: Optional[int] = None  # Unknown until the first response
+        self.reset_at = 0.0
+        self.paused_until = 0.0
+        self.updated_at = 0.0
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    def wait_seconds(self, now: float) -> float:
+        """How long until this quota may send a request."""
+        wait_until = self.paused_until
+        if self.remaining is not None and self.remaining <= 0 and self.reset_at > now:
+            wait_until = max(wait_until, self.reset_at)
+        return max(wait_until - now, 0.0)
+
+    def take(self, now: float):
+        if self.remaining is not None:
+            if self.reset_at <= now:
+                self.remaining = None  # Bucket has refilled; the next response tells us by how much
+            else:
+                self.remaining -= 1
+
+    def observe(self, response: httpx.Response, now: float) -> bool:
+        """Update from a response's headers. Returns True if the quota is now paused."""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is not None and remaining.isdigit() and reset and reset.isdigit():
+            self.remaining = int(remaining)
+            self.reset_at = float(reset)
+            self.updated_at = now
+        
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            self.paused_until = max(self.paused_until, now + int(retry_after))
+            self.updated_at = now
+        elif is_rate_limited(response) and self.remaining != 0:
+            # Secondary rate limit without a Retry-After
+            self.paused_until = max(self.paused_until, now + SECONDARY_LIMIT_PAUSE)
+            self.updated_at = now
+        return self.wait_seconds(now) > 0
+
+class RateLimiter:
+    """Hands out quotas to GitHub requests, waiting or refusing while all are exhausted."""
+    def __init__(self, tokens: List[Optional[str]]):
+        self.quotas = [Quota(token) for token in tokens]
+        self._synced_at = 0.0
+        self._published_at = 0.0
+
+    async def acquire(self) -> Quota:
+        """
+        Wait for a quota with requests left and take one request from it.
+        Raises GitHubUnavailableError when the wait would exceed
+        GITHUB_MAX_RATE_LIMIT_WAIT.
+        """
+        while True:
+            await self._sync()
+            now = time.time()
+            quota = min(self.quotas, key=lambda quota: quota.wait_seconds(now))
+            wait = quota.wait_seconds(now)
+            if wait <= 0:
+                quota.take(now)
+                return quota
+            if wait > GITHUB_MAX_RATE_LIMIT_WAIT:
+                raise GitHubUnavailableError(f"GitHub rate limit exhausted for {wait:.0f} seconds", now + wait)
+            print(f"GitHub rate limit reached, pausing requests for {wait:.1f} seconds")
+            await asyncio.sleep(wait)
+
+    async def observe(self, quota: Quota, response: httpx.Response):
+        """Record a response's rate limit headers, sharing pauses with other processes at once."""
+        now = time.time()
+        paused = quota.observe(response, now)
+        if paused or now - self._published_at >= RATE_LIMIT_SYNC_SECONDS:
+            self._published_at = now
+            try:
+                await db.run(_store_quotas, self.quotas)
+            except Exception as e:
+                print(f"Failed to share GitHub rate limit state: {str(e)}")
+
+    async def _sync(self):
+        """Adopt newer quota state published by other processes."""
+        now = time.time()
+        if now - self._synced_at < RATE_LIMIT_SYNC_SECONDS:
+            return
+        self._synced_at = now
+        try:
+            rows = await db.run(_load_quotas)
+        except Exception as e:
+            print(f"Failed to read shared GitHub rate limit state: {str(e)}")
+            return
+        for quota in self.quotas:
+            row = rows.get(quota.key)
+            if row is None:
+                continue
+            quota.paused_until = max(quota.paused_until, row["paused_until"])
+            if row["updated_at"] > quota.updated_at:
+                quota.remaining = row["remaining"]
+                quota.reset_at = row["reset_at"]
+                quota.updated_at = row["updated_at"]
+
+def _load_quotas() -> Dict[str, Dict]:
+    with db.connect() as conn:
+        rows = conn.execute(
+            "SELECT quota_key, remaining, reset_at, paused_until, updated_at FROM github_rate_limits"
+        ).fetchall()
+    return {row["quota_key"]: dict(row) for row in rows}
+
+def get_rate_limit_status() -> List[Dict]:
+    """Quota state as last published by any process, for status reporting."""
+    now = time.time()
+    status = []
+    for key, row in sorted(_load_quotas().items()):
+        quota = Quota(None)
+        quota.remaining, quota.reset_at, quota.paused_until = row["remaining"], row["reset_at"], row["paused_until"]
+        status.append({
+            "quota": key,
+            "remaining": row["remaining"],
+            "reset_at": row["reset_at"] or None,
+            "paused_for_seconds": round(quota.wait_seconds(now), 1),
+        })
+    return status
+
+def _store_quotas(quotas: List[Quota]):
+    with db.connect() as conn:
+        conn.executemany(
+            """INSERT INTO github_rate_limits (quota_key, remaining, reset_at, paused_until, updated_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (quota_key) DO UPDATE SET
+                   remaining = excluded.remaining, reset_at = excluded.reset_at,
+                   paused_until = MAX(paused_until, excluded.paused_until), updated_at = excluded.updated_at
+               WHERE excluded.updated_at >= updated_at""",
+            [(quota.key, quota.remaining, quota.reset_at, quota.paused_until, quota.updated_at)
+             for quota in quotas if quota.updated_at]
+        )
+
+limiter = RateLimiter(GITHUB_TOKENS or [None])
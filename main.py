@@ -1,20 +1,54 @@
 import os
 import uuid
+import base64
 import json
+import hashlib
+import asyncio
+import signal
+import threading
 from pathlib import Path
-from typing import Optional, List
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from typing import Optional, List, BinaryIO, Dict, NamedTuple, Tuple
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
 import sqlite3
 from datetime import datetime
 
 # Import task queue system
-from task_queue import add_task_to_queue, start_worker, stop_worker
+from task_queue import (
+    JobFinishedError, MAX_PRIORITY, MAX_QUEUE_DEPTH, MIN_PRIORITY, QueueFullError, cancel_job, check_queue_capacity, count_queued_ahead,
+    enqueue_job, notify_cancel_requested, estimate_capacity, estimate_completion_seconds,
+    estimate_job_completion_seconds, notify_task_available, get_queue_size,
+    get_job_timings, get_scheduling_status, get_worker_status, retry_after_seconds, start_worker, stop_worker
+)
+from github_rate_limit import get_rate_limit_status
+from pdf_processor import count_pdf_pages
+import db
+import events
+import maintenance
+import metrics
+import orgs
+import profiling
 
 # Simple configuration
-DATABASE_FILE = "jobs.db"
-UPLOAD_DIR = Path("uploads")
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
 UPLOAD_DIR.mkdir(exist_ok=True)
+# Set RUN_WORKERS=false to serve the API only and process jobs with `python worker.py`
+RUN_WORKERS = os.getenv("RUN_WORKERS", "true").lower() == "true"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Allowance for multipart boundaries and part headers
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "500"))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+MAX_BATCH_STATUS_IDS = 1000
+JOB_LIST_DEFAULT_LIMIT = 50
+
+UPLOAD_SIZE_BYTES = metrics.Histogram(
+    "upload_size_bytes", "Size of accepted PDF uploads",
+    buckets=[2 ** exponent for exponent in range(14, 27, 2)]  # 16 KB to 64 MB
+)
+SQLITE_MAX_PARAMS = 500  # Chunk size for IN (...) lists, below SQLite's bound-parameter limit
 
 app = FastAPI(
     title="PDF Processing API - Async Queue",
@@ -30,32 +64,84 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database
-def init_db():
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS jobs (
-            job_id TEXT PRIMARY KEY,
-            original_filename TEXT NOT NULL,
-            extracted_company_username TEXT,
-            github_members TEXT,
-            status TEXT NOT NULL,
-            timestamp TEXT NOT NULL
-        )
-    """)
-    conn.commit()
-    conn.close()
+class UploadSizeLimitMiddleware:
+    """
+    Cap upload request bodies. A declared Content-Length over the limit is
+    refused before the body is read; otherwise (chunked uploads included)
+    the body is counted as it arrives and the request fails with 413 as
+    soon as it passes the limit, before the multipart parser spools the
+    rest to disk.
+    """
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith("/api/documents"):
+            return await self.app(scope, receive, send)
+        
+        limit = MAX_BATCH_UPLOAD_BYTES if scope["path"].endswith("/batch") else MAX_UPLOAD_BYTES
+        detail = f"Upload too large (limit is {limit} bytes)"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit + MULTIPART_OVERHEAD_BYTES:
+            return await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+        
+        received = 0
+        
+        async def receive_within_limit():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit + MULTIPART_OVERHEAD_BYTES:
+                    # Raised inside form parsing, which passes HTTPException through as the response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, receive_within_limit, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
+def close_event_streams_on_exit():
+    """
+    uvicorn waits for open responses to finish before it runs the shutdown
+    handlers, and event streams do not finish by themselves. Chain onto its
+    SIGINT/SIGTERM handlers so the streams are closed as soon as it starts
+    exiting.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return  # Signal handlers can only be set from the main thread
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue  # Nothing to chain onto; keep the default behaviour
+        
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(lambda: asyncio.ensure_future(events.close()))
+            previous(signum, frame)
+        
+        signal.signal(sig, handler)
 
 @app.on_event("startup")
 async def startup_event():
-    init_db()
-    await start_worker()  # Start the background worker
-    print("Application started with background task worker")
+    await db.run(db.init_db, UPLOAD_DIR)
+    await events.start()
+    close_event_streams_on_exit()
+    await maintenance.start(UPLOAD_DIR)
+    if not RUN_WORKERS:
+        print("Application started in API-only mode (run worker.py to process jobs)")
+        return
+    await start_worker()  # Start the background worker pool (WORKER_CONCURRENCY)
+    print("Application started with background task workers")
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    await stop_worker()  # Stop the background worker
-    print("Background task worker stopped")
+    if RUN_WORKERS:
+        await stop_worker()  # Stop the background worker pool
+        print("Background task workers stopped")
+    await events.stop()
+    await maintenance.stop()
+    db.close()
 
 @app.get("/")
 async def root():
@@ -65,14 +151,188 @@ async def root():
         "queue_info": "Tasks are processed asynchronously in background"
     }
 
+def find_duplicate_job(conn: sqlite3.Connection, content_hash: str) -> Optional[sqlite3.Row]:
+    """
+    Find a job that already processed (or is processing) the same content.
+    A completed job is preferred; otherwise an in-flight job that is not
+    itself a duplicate.
+    """
+    return conn.execute(
+        """SELECT COALESCE(duplicate_of, job_id) AS job_id, extracted_company_username, org_id, members_snapshot_id, status,
+                  started_at, available_at,
+                  (SELECT COUNT(*) FROM jobs ahead
+                   WHERE ahead.status = 'queued' AND ahead.duplicate_of IS NULL AND ahead.priority >= jobs.priority
+                  ) AS queue_position
+           FROM jobs
+           WHERE content_hash = ?
+             AND (status = 'completed' OR (status IN ('queued', 'processing', 'deferred') AND duplicate_of IS NULL))
+           ORDER BY status = 'completed' DESC, timestamp DESC
+           LIMIT 1""",
+        (content_hash,)
+    ).fetchone()
+
+class PendingUpload(NamedTuple):
+    """A stored upload waiting to be recorded as a job."""
+    job_id: str
+    filename: str
+    timestamp: str
+    content_hash: str
+    file_path: Path
+    page_count: Optional[int]
+
+def record_upload(conn: sqlite3.Connection, upload: PendingUpload, force_reprocess: bool,
+                  priority: int, client_id: str) -> Optional[sqlite3.Row]:
+    """
+    Record an uploaded file as a job using the caller's transaction.
+    Returns the job it duplicates, or None when it was queued for processing.
+    """
+    duplicate = None if force_reprocess else find_duplicate_job(conn, upload.content_hash)
+    
+    if duplicate is None:
+        enqueue_job(conn, upload.job_id, str(upload.file_path), upload.filename, upload.content_hash,
+                    upload.timestamp, priority, client_id, upload.page_count)
+        return None
+    
+    # Same content seen before: resolve from (or wait on) the original job
+    conn.execute(
+        """INSERT INTO jobs (job_id, original_filename, extracted_company_username, org_id, members_snapshot_id,
+                             status, timestamp, content_hash, duplicate_of, client_id, page_count)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (upload.job_id, upload.filename, duplicate["extracted_company_username"], duplicate["org_id"],
+         duplicate["members_snapshot_id"],
+         "completed" if duplicate["status"] == "completed" else "queued", upload.timestamp,
+         upload.content_hash, duplicate["job_id"], client_id, upload.page_count)
+    )
+    return duplicate
+
+def create_upload_job(upload: PendingUpload, force_reprocess: bool,
+                      priority: int, client_id: str) -> Tuple[Optional[sqlite3.Row], int]:
+    """
+    Record an uploaded file as a job, in one transaction so concurrent
+    identical uploads cannot both become the original.
+    Returns the duplicated job (or None) and the new job's queue position;
+    raises QueueFullError when the queue has no room.
+    """
+    with db.transaction() as conn:
+        duplicate = record_upload(conn, upload, force_reprocess, priority, client_id)
+        check_queue_capacity(conn, 1 if duplicate is None else 0)
+        return duplicate, count_queued_ahead(conn, priority)
+
+def create_upload_jobs(uploads: List[PendingUpload], force_reprocess: bool,
+                       priority: int, client_id: str) -> Tuple[List[Optional[sqlite3.Row]], int]:
+    """
+    Record a batch of uploads in a single transaction.
+    Returns the duplicated job (or None) for each upload, in order, and the
+    queue position of the last new job; raises QueueFullError if they do
+    not all fit.
+    """
+    with db.transaction() as conn:
+        duplicates = [record_upload(conn, upload, force_reprocess, priority, client_id) for upload in uploads]
+        check_queue_capacity(conn, sum(1 for duplicate in duplicates if duplicate is None))
+        return duplicates, count_queued_ahead(conn, priority)
+
+def client_id_for(request: Request) -> str:
+    """Who submitted a request, for fair scheduling: X-Client-ID, else the client address."""
+    client_id = request.headers.get("x-client-id") or (request.client.host if request.client else "")
+    return client_id[:128]
+
+async def queue_full_error(depth: int) -> HTTPException:
+    """429 with a Retry-After derived from the observed processing throughput."""
+    capacity = await db.run(estimate_capacity)
+    return HTTPException(
+        status_code=429,
+        detail=f"Queue is full ({depth} jobs waiting). Try again later.",
+        headers={"Retry-After": str(retry_after_seconds(depth, capacity))}
+    )
+
+async def check_admission():
+    """Refuse uploads up front while the queue is full, before any file is written."""
+    if MAX_QUEUE_DEPTH:
+        depth = await db.run(get_queue_size)
+        if depth >= MAX_QUEUE_DEPTH:
+            raise await queue_full_error(depth)
+
+def upload_response(job_id: str, duplicate: Optional[sqlite3.Row],
+                    position: Optional[int] = None, capacity: Optional[Dict] = None) -> Dict:
+    if duplicate is None:
+        eta = estimate_completion_seconds(position, capacity) if capacity else None
+        return {
+            "job_id": job_id, 
+            "status": "queued",
+            "message": "PDF uploaded successfully. Processing will begin shortly.",
+            "queue_position": position,
+            "estimated_processing_time": f"{eta} seconds" if eta is not None else "unknown (no workers running)",
+            "estimated_completion_seconds": eta
+        }
+    if duplicate["status"] == "completed":
+        return {
+            "job_id": job_id,
+            "status": "completed",
+            "duplicate_of": duplicate["job_id"],
+            "message": "Identical PDF was already processed. Result reused from the earlier job.",
+            "estimated_processing_time": "0 seconds"
+        }
+    # Completes with the original job, so the estimate is the original's
+    eta = estimate_job_completion_seconds(duplicate, capacity) if capacity else None
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "duplicate_of": duplicate["job_id"],
+        "message": "Identical PDF is already being processed. This job will complete with it.",
+        "estimated_processing_time": f"{eta} seconds" if eta is not None else "unknown (no workers running)",
+        "estimated_completion_seconds": eta
+    }
+
+def _write_chunk(f: BinaryIO, digest, chunk: bytes):
+    digest.update(chunk)
+    f.write(chunk)
+
+async def save_upload(file: UploadFile, file_path: Path) -> Tuple[int, str]:
+    """
+    Stream an upload to disk in UPLOAD_CHUNK_SIZE chunks, hashing it in the
+    same pass. File I/O runs in a thread so the event loop stays free.
+    
+    Returns (size_in_bytes, sha256_hexdigest). Raises HTTPException 413 for
+    files over MAX_UPLOAD_BYTES and 400 for content that is not a PDF.
+    """
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large (limit is {MAX_UPLOAD_BYTES} bytes)")
+    
+    digest = hashlib.sha256()
+    size = 0
+    f = await asyncio.to_thread(open, file_path, 'wb')
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            if size == 0 and not chunk.startswith(b"%PDF"):
+                raise HTTPException(status_code=400, detail="File is not a valid PDF")
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"File too large (limit is {MAX_UPLOAD_BYTES} bytes)")
+            await asyncio.to_thread(_write_chunk, f, digest, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        file_path.unlink(missing_ok=True)
+        raise
+    await asyncio.to_thread(f.close)
+    UPLOAD_SIZE_BYTES.observe(size)
+    return size, digest.hexdigest()
+
 @app.post("/api/documents/upload")
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(request: Request, file: UploadFile = File(...), force_reprocess: bool = False,
+                          priority: int = Query(0, ge=MIN_PRIORITY, le=MAX_PRIORITY)):
     """
     Upload PDF for async processing.
     Returns immediately with job_id while processing happens in background.
+    
+    Uploads whose content matches an earlier job reuse its result (or join
+    its in-flight run) unless force_reprocess is set. Higher priority jobs
+    run first; clients (X-Client-ID) at the same priority take turns.
     """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    await check_admission()
 
     # Generate job ID
     job_id = str(uuid.uuid4())
@@ -81,85 +341,408 @@ async def upload_document(file: UploadFile = File(...)):
     # Save file temporarily
     file_path = UPLOAD_DIR / f"{job_id}.pdf"
     try:
-        content = await file.read()
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        _, content_hash = await save_upload(file, file_path)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    page_count = await asyncio.to_thread(count_pdf_pages, str(file_path))
+    upload = PendingUpload(job_id, file.filename, timestamp, content_hash, file_path, page_count)
 
-    # Insert initial job record with "queued" status
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.execute(
-        "INSERT INTO jobs (job_id, original_filename, status, timestamp) VALUES (?, ?, ?, ?)",
-        (job_id, file.filename, "queued", timestamp)
-    )
-    conn.commit()
-    conn.close()
+    try:
+        duplicate, position = await db.run(create_upload_job, upload, force_reprocess, priority, client_id_for(request))
+    except QueueFullError as e:
+        await asyncio.to_thread(file_path.unlink)
+        raise await queue_full_error(e.depth)
+    
+    if duplicate is not None:
+        await asyncio.to_thread(file_path.unlink)
+        return upload_response(job_id, duplicate, capacity=await db.run(estimate_capacity))
+    
+    # Job is stored as "queued"; wake local workers to claim it
+    notify_task_available()
 
-    # Add task to queue for background processing
-    await add_task_to_queue(job_id, str(file_path), file.filename)
+    # Return immediately with job ID and an estimate from the job's queue position
+    return upload_response(job_id, None, position, await db.run(estimate_capacity))
 
-    # Return immediately with job ID
+@app.post("/api/documents/upload/batch")
+async def upload_documents(request: Request, files: List[UploadFile] = File(...), force_reprocess: bool = False,
+                           priority: int = Query(0, ge=MIN_PRIORITY, le=MAX_PRIORITY)):
+    """
+    Upload many PDFs at once; all valid files are enqueued in one transaction.
+    
+    Files that are rejected (not a PDF, too large) do not fail the batch;
+    they are reported in "errors" with their position in the request.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per batch")
+    await check_admission()
+    
+    uploads: List[PendingUpload] = []
+    errors = []
+    for index, file in enumerate(files):
+        if not file.filename.lower().endswith('.pdf'):
+            errors.append({"index": index, "filename": file.filename, "detail": "Only PDF files are allowed"})
+            continue
+        
+        job_id = str(uuid.uuid4())
+        file_path = UPLOAD_DIR / f"{job_id}.pdf"
+        try:
+            _, content_hash = await save_upload(file, file_path)
+        except HTTPException as e:
+            errors.append({"index": index, "filename": file.filename, "detail": e.detail})
+            continue
+        except Exception as e:
+            for upload in uploads:
+                upload.file_path.unlink(missing_ok=True)
+            raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+        page_count = await asyncio.to_thread(count_pdf_pages, str(file_path))
+        uploads.append(PendingUpload(job_id, file.filename, datetime.now().isoformat(), content_hash, file_path,
+                                     page_count))
+    
+    try:
+        duplicates, position = await db.run(
+            create_upload_jobs, uploads, force_reprocess, priority, client_id_for(request)
+        ) if uploads else ([], 0)
+    except QueueFullError as e:
+        for upload in uploads:
+            await asyncio.to_thread(upload.file_path.unlink)
+        raise await queue_full_error(e.depth)
+    
+    capacity = await db.run(estimate_capacity)
+    position -= sum(1 for duplicate in duplicates if duplicate is None)
+    jobs = []
+    for upload, duplicate in zip(uploads, duplicates):
+        if duplicate is not None:
+            await asyncio.to_thread(upload.file_path.unlink)
+        else:
+            position += 1
+        jobs.append({"filename": upload.filename, **upload_response(upload.job_id, duplicate, position, capacity)})
+    
+    if any(duplicate is None for duplicate in duplicates):
+        notify_task_available()
+    
     return {
-        "job_id": job_id, 
-        "status": "queued",
-        "message": "PDF uploaded successfully. Processing will begin shortly.",
-        "estimated_processing_time": "30-300 seconds"
+        "jobs": jobs,
+        "errors": errors,
+        "queued": sum(1 for job in jobs if job["status"] == "queued"),
+        "rejected": len(errors)
     }
 
-@app.get("/api/jobs/{job_id}")
-async def get_job_status(job_id: str):
+@app.get("/api/jobs/events")
+async def stream_job_events(request: Request, job_ids: str, last_event_id: Optional[int] = None):
     """
-    Get job status and results.
-    Status can be: 'queued', 'processing', 'completed', 'failed'
+    Stream status changes of one or more jobs as Server-Sent Events.
+    
+    job_ids is a comma-separated list. The stream starts with each job's
+    current status; a reconnecting client sends Last-Event-ID (or the
+    last_event_id query parameter) to receive only what it missed.
     """
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
-    row = cursor.fetchone()
-    conn.close()
+    ids = list(dict.fromkeys(job_id for job_id in job_ids.split(",") if job_id))
+    if not ids:
+        raise HTTPException(status_code=400, detail="job_ids must name at least one job")
+    if len(ids) > events.MAX_SUBSCRIBED_JOBS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {events.MAX_SUBSCRIBED_JOBS} jobs per subscription"
+        )
     
-    if not row:
-        raise HTTPException(status_code=404, detail="Job not found")
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    
+    async def stream():
+        async for message in events.subscribe(ids, last_event_id):
+            if await request.is_disconnected():
+                break
+            yield message
     
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+JOB_COLUMNS = """job_id, original_filename, extracted_company_username, github_members,
+                 status, timestamp, duplicate_of, version, available_at, members_snapshot_id, cancel_requested"""
+
+# Job rows come with the member lists they reference: snapshot_id -> logins
+MemberLists = Dict[int, List[str]]
+
+def fetch_job(job_id: str) -> Tuple[Optional[sqlite3.Row], MemberLists]:
+    with db.connect() as conn:
+        row = conn.execute(
+            f"SELECT {JOB_COLUMNS} FROM jobs WHERE job_id = ?",
+            (job_id,)
+        ).fetchone()
+        return row, orgs.load_members(conn, [row["members_snapshot_id"]] if row else [])
+
+def fetch_jobs(job_ids: List[str]) -> Tuple[List[sqlite3.Row], MemberLists]:
+    """Fetch many jobs by primary key with IN (...) queries, one per SQLITE_MAX_PARAMS ids."""
+    rows = []
+    with db.connect() as conn:
+        for start in range(0, len(job_ids), SQLITE_MAX_PARAMS):
+            chunk = job_ids[start:start + SQLITE_MAX_PARAMS]
+            rows.extend(conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE job_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ))
+        return rows, orgs.load_members(conn, [row["members_snapshot_id"] for row in rows])
+
+def job_response(row: sqlite3.Row, members: MemberLists) -> Dict:
     job_data = {
         "job_id": row[0],
         "original_filename": row[1],
         "extracted_company_username": row[2],
-        "github_members": json.loads(row[3]) if row[3] else None,
+        # Rows written before member lists were normalized may still carry their own copy
+        "github_members": members.get(row[9]) if row[9] else (json.loads(row[3]) if row[3] else None),
         "status": row[4],
-        "timestamp": row[5]
+        "timestamp": row[5],
+        "duplicate_of": row[6]
     }
     
     # Add helpful messages based on status
     if job_data["status"] == "queued":
         job_data["message"] = "Job is waiting in queue to be processed"
+    elif job_data["status"] == "processing" and row[10]:
+        job_data["message"] = "Cancellation requested; the job is being stopped"
     elif job_data["status"] == "processing":
-        job_data["message"] = "Job is currently being processed (this may take 30-300 seconds)"
+        # No time estimate: the body is cached under the job's version, which estimates don't change
+        job_data["message"] = "Job is currently being processed"
     elif job_data["status"] == "completed":
         job_data["message"] = "Job completed successfully"
+    elif job_data["status"] == "deferred":
+        job_data["message"] = "GitHub is rate limited or unavailable; the job will be retried"
+        job_data["retry_at"] = row[8]
     elif job_data["status"] == "failed":
         job_data["message"] = "Job processing failed"
+    elif job_data["status"] == "timed_out":
+        job_data["message"] = "Job exceeded a processing deadline"
+    elif job_data["status"] == "cancelled":
+        job_data["message"] = "Job was cancelled"
     
     return job_data
 
+class BatchStatusRequest(BaseModel):
+    job_ids: List[str]
+
+@app.post("/api/jobs/batch-status")
+async def get_batch_job_status(request: BatchStatusRequest):
+    """
+    Get the status and results of many jobs in one request.
+    Unknown IDs are listed in "not_found" instead of failing the request.
+    """
+    ids = list(dict.fromkeys(request.job_ids))
+    if len(ids) > MAX_BATCH_STATUS_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_STATUS_IDS} job IDs per request")
+    
+    rows, members = await db.run(fetch_jobs, ids) if ids else ([], {})
+    jobs = {row["job_id"]: job_response(row, members) for row in rows}
+    return {
+        "jobs": [jobs[job_id] for job_id in ids if job_id in jobs],
+        "not_found": [job_id for job_id in ids if job_id not in jobs]
+    }
+
+def encode_cursor(row: sqlite3.Row) -> str:
+    return base64.urlsafe_b64encode(json.dumps([row["timestamp"], row["job_id"]]).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        timestamp, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return str(timestamp), str(job_id)
+
+def list_jobs(status: Optional[str], org: Optional[str], after: Optional[Tuple[str, str]],
+              limit: int) -> List[sqlite3.Row]:
+    """
+    One page of jobs, newest first, seeking past the (timestamp, job_id) of
+    the previous page's last job so deep pages cost the same as the first.
+    Fetches one extra row to tell whether another page follows.
+    """
+    conditions, params = [], []
+    with db.connect() as conn:
+        if org:
+            org_id = orgs.get_org_id(conn, org)
+            if org_id is None:
+                return []
+            conditions.append("org_id = ?")
+            params.append(org_id)
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if after:
+            conditions.append("(timestamp, job_id) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return conn.execute(
+            f"""SELECT job_id, original_filename, extracted_company_username, status, timestamp, duplicate_of
+                FROM jobs {where}
+                ORDER BY timestamp DESC, job_id DESC
+                LIMIT ?""",
+            (*params, limit + 1)
+        ).fetchall()
+
+@app.get("/api/jobs")
+async def get_jobs(status: Optional[str] = None, org: Optional[str] = None, cursor: Optional[str] = None,
+                   limit: int = Query(JOB_LIST_DEFAULT_LIMIT, ge=1, le=MAX_BATCH_STATUS_IDS)):
+    """
+    List jobs newest first, optionally filtered by status and organization.
+    Pass the returned next_cursor to get the following page; it is null on
+    the last page. Member lists are left out; fetch a job (or use
+    batch-status) for them.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    rows = await db.run(list_jobs, status, org, after, limit)
+    return {
+        "jobs": [dict(row) for row in rows[:limit]],
+        "next_cursor": encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    }
+
+def job_etag(version: int) -> str:
+    return f'"{version}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str, request: Request, response: Response):
+    """
+    Get job status and results.
+    Status can be: 'queued', 'processing', 'deferred', 'completed', 'failed', 'timed_out', 'cancelled'
+    
+    The response carries the job's version as ETag. A poll with a matching
+    If-None-Match is answered 304 from the in-memory version map, without a
+    database query, while the job is unchanged.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    version = events.get_job_version(job_id)
+    if version is not None and etag_matches(if_none_match, job_etag(version)):
+        return Response(status_code=304, headers={"ETag": job_etag(version), "Cache-Control": "no-cache"})
+    
+    row, members = await db.run(fetch_job, job_id)
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    events.remember_job_version(job_id, row["version"])
+    etag = job_etag(row["version"])
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return job_response(row, members)
+
+@app.get("/api/jobs/{job_id}/profile")
+async def get_job_profile(job_id: str):
+    """
+    Timing spans of a job's last processing attempt, and for slow jobs a
+    cProfile summary of its PDF extraction. Only recorded with
+    JOB_PROFILING=true; duplicate uploads have no profile of their own.
+    """
+    profile = await db.run(profiling.get_profile, job_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile recorded for this job")
+    return profile
+
+def fetch_org_jobs(org: str, status: Optional[str], limit: int) -> Optional[Dict]:
+    """An organization's latest member list summary and its most recent jobs, newest first."""
+    with db.connect() as conn:
+        org_row = conn.execute(
+            """SELECT o.org_id, o.username, s.member_count, s.created_at
+               FROM orgs o LEFT JOIN member_snapshots s ON s.snapshot_id = o.latest_snapshot_id
+               WHERE o.username = ?""",
+            (org,)
+        ).fetchone()
+        if org_row is None:
+            return None
+        
+        rows = conn.execute(
+            f"""SELECT job_id, original_filename, status, timestamp, duplicate_of, members_snapshot_id
+                FROM jobs
+                WHERE org_id = ? {"AND status = ?" if status else ""}
+                ORDER BY timestamp DESC, job_id DESC
+                LIMIT ?""",
+            (org_row["org_id"], status, limit) if status else (org_row["org_id"], limit)
+        ).fetchall()
+    return {
+        "org": org_row["username"],
+        "member_count": org_row["member_count"] or 0,
+        "members_updated_at": org_row["created_at"],
+        "jobs": [dict(row) for row in rows]
+    }
+
+@app.get("/api/orgs/{org}/jobs")
+async def get_org_jobs(org: str, status: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_BATCH_STATUS_IDS)):
+    """
+    List the jobs that resolved to an organization (case-insensitive), newest
+    first, optionally only those with the given status. Jobs sharing a
+    members_snapshot_id saw the same member list; fetch a job for it.
+    """
+    result = await db.run(fetch_org_jobs, org, status, limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    return result
+
+@app.delete("/api/jobs/{job_id}")
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job_endpoint(job_id: str):
+    """
+    Cancel a job. A waiting job is cancelled at once (200); a job being
+    processed is stopped by its worker within about a second (202), after
+    which its status is 'cancelled'. Finished jobs, cancelled ones included,
+    cannot be cancelled (409). A duplicate upload waiting on the cancelled
+    job takes over its processing.
+    """
+    try:
+        status, orphan = await db.run(cancel_job, job_id)
+    except JobFinishedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if orphan:
+        await asyncio.to_thread(Path(orphan).unlink, missing_ok=True)
+    
+    if status == "cancelled":
+        notify_task_available()  # A duplicate upload may have taken the job's place
+        return {"job_id": job_id, "status": "cancelled", "message": "Job was cancelled"}
+    if status == "processing":
+        notify_cancel_requested()
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job_id, "status": "processing", "message": "Cancellation requested; the job is being stopped"}
+        )
+
+def count_jobs_by_status() -> Dict[str, int]:
+    """Job counts per status, from the trigger-maintained summary table."""
+    with db.connect() as conn:
+        cursor = conn.execute("SELECT status, count FROM job_status_counts WHERE count > 0")
+        return {row["status"]: row["count"] for row in cursor}
+
 @app.get("/api/queue/status")
 async def get_queue_status():
     """Get current queue status and statistics."""
-    from task_queue import task_queue, worker_running
-    
-    # Count jobs by status
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.execute("""
-        SELECT status, COUNT(*) as count 
-        FROM jobs 
-        GROUP BY status
-    """)
-    status_counts = dict(cursor.fetchall())
-    conn.close()
-    
+    status_counts = await db.run(count_jobs_by_status)
+    workers = await db.run(get_worker_status)
     return {
-        "worker_running": worker_running,
-        "queue_size": task_queue.qsize(),
+        "worker_running": workers["processes"] > 0,
+        "workers": {key: workers[key] for key in ("processes", "concurrency", "busy", "idle", "active_jobs")},
+        "queue_size": await db.run(get_queue_size),
+        "max_queue_depth": MAX_QUEUE_DEPTH or None,
+        "scheduling": await db.run(get_scheduling_status),
         "job_statistics": status_counts,
-        "total_jobs": sum(status_counts.values())
-    } 
\ No newline at end of file
+        "total_jobs": sum(status_counts.values()),
+        "timings": await db.run(get_job_timings),
+        "github_rate_limits": await db.run(get_rate_limit_status),
+        "maintenance": await db.run(maintenance.get_maintenance_status),
+        "member_cache": workers["member_cache"],
+        "extraction_methods": workers["extraction_methods"]
+    } 
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics of this process (and the workers it embeds)."""
+    return Response(await db.run(metrics.render), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,240 @@
+"""
+Database and upload directory maintenance.
+
+The API runs these passes in the background every MAINTENANCE_INTERVAL
+seconds; with several API processes sharing one jobs.db, only one of them
+runs each pass. A pass can also be run by hand (or from cron):
+
+    python maintenance.py --vacuum
+
+Each pass:
+- purges (or, with JOB_ARCHIVE_DIR, archives then purges) finished jobs
+  older than JOB_RETENTION_DAYS, with their events and profiles, in small
+  batches so the queue never waits long for the write lock;
+- drops member list snapshots no job references any more, round-robin
+  turns of clients gone quiet and rows of workers that stopped
+  heartbeating;
+- removes files in uploads/ that belong to no queued or running job
+  (left behind by crashes);
+- refreshes query planner statistics (PRAGMA optimize) and, when enough
+  of the file is free pages, VACUUMs at most every VACUUM_INTERVAL.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import db
+
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "30"))  # 0 keeps jobs forever
+JOB_ARCHIVE_DIR = os.getenv("JOB_ARCHIVE_DIR", "")  # Purged jobs are appended here as JSON lines
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "3600"))
+VACUUM_INTERVAL = float(os.getenv("VACUUM_INTERVAL", str(7 * 86400)))
+VACUUM_MIN_FREE_RATIO = 0.2  # Free pages as a share of the file before VACUUM is worth it
+RETENTION_BATCH_SIZE = 500
+RETENTION_BATCH_PAUSE = 0.05  # Seconds between batches, so other writers get the lock
+ORPHAN_FILE_GRACE_SECONDS = 3600  # Uploads are written before their job row exists
+CLIENT_TURN_RETENTION = 86400
+STALE_WORKER_SECONDS = 86400
+
+# Statuses a job never leaves, so it is safe to purge
+FINAL_STATUSES = ("completed", "failed", "timed_out", "cancelled")
+
+_maintenance_task: Optional[asyncio.Task] = None
+
+def claim_run(task: str, interval: float) -> bool:
+    """
+    Record that this process runs task now, unless any process ran it within
+    the last interval seconds.
+    """
+    now = time.time()
+    with db.transaction() as conn:
+        row = conn.execute("SELECT last_run_at FROM maintenance_runs WHERE task = ?", (task,)).fetchone()
+        if row is not None and now - row[0] < interval:
+            return False
+        conn.execute(
+            """INSERT INTO maintenance_runs (task, last_run_at, result) VALUES (?, ?, NULL)
+               ON CONFLICT (task) DO UPDATE SET last_run_at = excluded.last_run_at""",
+            (task, now)
+        )
+        return True
+
+def record_result(task: str, result: Dict[str, Any]):
+    with db.connect() as conn:
+        conn.execute("UPDATE maintenance_runs SET result = ? WHERE task = ?", (json.dumps(result), task))
+
+def get_maintenance_status() -> Dict[str, Any]:
+    """When each maintenance task last ran, and what the last pass did."""
+    with db.connect() as conn:
+        rows = conn.execute("SELECT task, last_run_at, result FROM maintenance_runs").fetchall()
+    return {
+        row["task"]: {"last_run_at": row["last_run_at"], "result": json.loads(row["result"]) if row["result"] else None}
+        for row in rows
+    }
+
+def purge_jobs_batch(cutoff: str, archive_dir: str) -> int:
+    """Delete (after archiving, if configured) one batch of finished jobs older than cutoff."""
+    placeholders = ",".join("?" * len(FINAL_STATUSES))
+    with db.transaction() as conn:
+        rows = conn.execute(
+            f"""SELECT j.*, s.members AS snapshot_members
+                FROM jobs j LEFT JOIN member_snapshots s ON s.snapshot_id = j.members_snapshot_id
+                WHERE j.status IN ({placeholders}) AND j.timestamp < ?
+                LIMIT ?""",
+            (*FINAL_STATUSES, cutoff, RETENTION_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        if archive_dir:
+            _archive(rows, Path(archive_dir))
+        job_ids = [row["job_id"] for row in rows]
+        id_placeholders = ",".join("?" * len(job_ids))
+        conn.execute(f"DELETE FROM job_events WHERE job_id IN ({id_placeholders})", job_ids)
+        conn.execute(f"DELETE FROM job_profiles WHERE job_id IN ({id_placeholders})", job_ids)
+        conn.execute(f"DELETE FROM jobs WHERE job_id IN ({id_placeholders})", job_ids)
+    return len(rows)
+
+def _archive(rows: List, archive_dir: Path):
+    """Append jobs to today's archive file, one JSON object per line."""
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"jobs-{datetime.now():%Y-%m-%d}.jsonl"
+    with path.open("a") as archive:
+        for row in rows:
+            job = {key: row[key] for key in row.keys() if key not in ("github_members", "snapshot_members")}
+            members = row["snapshot_members"] or row["github_members"]
+            job["github_members"] = json.loads(members) if members else None
+            archive.write(json.dumps(job) + "\n")
+
+async def purge_old_jobs(retention_days: Optional[float] = None, archive_dir: Optional[str] = None) -> int:
+    """Purge finished jobs past the retention period, batch by batch."""
+    retention_days = JOB_RETENTION_DAYS if retention_days is None else retention_days
+    archive_dir = JOB_ARCHIVE_DIR if archive_dir is None else archive_dir
+    if retention_days <= 0:
+        return 0
+
+    # Job timestamps are local ISO times, which sort chronologically as text
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    purged = 0
+    while True:
+        count = await db.run(purge_jobs_batch, cutoff, archive_dir)
+        purged += count
+        if count < RETENTION_BATCH_SIZE:
+            return purged
+        await asyncio.sleep(RETENTION_BATCH_PAUSE)
+
+def prune_unreferenced_rows() -> Dict[str, int]:
+    """Drop bookkeeping rows nothing depends on any more."""
+    now = time.time()
+    with db.connect() as conn:
+        snapshots = conn.execute(
+            """DELETE FROM member_snapshots
+               WHERE snapshot_id NOT IN (SELECT latest_snapshot_id FROM orgs WHERE latest_snapshot_id IS NOT NULL)
+                 AND NOT EXISTS (SELECT 1 FROM jobs WHERE members_snapshot_id = member_snapshots.snapshot_id)"""
+        ).rowcount
+        client_turns = conn.execute(
+            """DELETE FROM client_turns
+               WHERE served_at < ?
+                 AND NOT EXISTS (SELECT 1 FROM jobs WHERE status = 'queued' AND client_id = client_turns.client_id)""",
+            (now - CLIENT_TURN_RETENTION,)
+        ).rowcount
+        workers = conn.execute(
+            "DELETE FROM workers WHERE heartbeat_at < ?", (now - STALE_WORKER_SECONDS,)
+        ).rowcount
+    return {"snapshots": snapshots, "client_turns": client_turns, "workers": workers}
+
+def remove_orphan_files(upload_dir: Path) -> int:
+    """Delete uploads no queued, running or deferred job will read."""
+    with db.connect() as conn:
+        in_use = {
+            Path(row[0]).name for row in conn.execute(
+                """SELECT file_path FROM jobs
+                   WHERE status IN ('queued', 'processing', 'deferred') AND file_path IS NOT NULL"""
+            )
+        }
+    cutoff = time.time() - ORPHAN_FILE_GRACE_SECONDS
+    removed = 0
+    for path in upload_dir.glob("*"):
+        try:
+            if path.is_file() and path.name not in in_use and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass  # Cleaned up by its worker meanwhile
+    return removed
+
+def optimize_database(vacuum: bool = False) -> Dict[str, Any]:
+    """
+    Refresh planner statistics, and VACUUM when forced or when free pages
+    make up VACUUM_MIN_FREE_RATIO of the file and the last VACUUM (by any
+    process) is older than VACUUM_INTERVAL.
+    """
+    with db.connect() as conn:
+        conn.execute("PRAGMA optimize")
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    free_ratio = free_pages / page_count if page_count else 0.0
+    vacuumed = False
+    if vacuum or (free_ratio >= VACUUM_MIN_FREE_RATIO and claim_run("vacuum", VACUUM_INTERVAL)):
+        started = time.perf_counter()
+        with db.connect() as conn:
+            conn.execute("VACUUM")
+        vacuumed = True
+        print(f"Vacuumed database ({free_pages} of {page_count} pages free) in {time.perf_counter() - started:.1f}s")
+    return {"free_page_ratio": round(free_ratio, 3), "vacuumed": vacuumed}
+
+async def run_maintenance(upload_dir: Path, vacuum: bool = False) -> Dict[str, Any]:
+    """One full maintenance pass."""
+    started = time.perf_counter()
+    result = {"purged_jobs": await purge_old_jobs()}
+    result["pruned"] = await db.run(prune_unreferenced_rows)
+    result["orphan_files"] = await asyncio.to_thread(remove_orphan_files, upload_dir)
+    result.update(await db.run(optimize_database, vacuum))
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Maintenance: {result}")
+    return result
+
+async def _maintenance_loop(upload_dir: Path):
+    # Check often enough that a pass is never much later than due, whichever process runs it
+    check_interval = min(MAINTENANCE_INTERVAL, 300.0)
+    while True:
+        try:
+            if await db.run(claim_run, "maintenance", MAINTENANCE_INTERVAL):
+                result = await run_maintenance(upload_dir)
+                await db.run(record_result, "maintenance", result)
+        except Exception as e:
+            print(f"Maintenance error: {str(e)}")
+        await asyncio.sleep(check_interval)
+
+async def start(upload_dir: Path):
+    """Start periodic maintenance (MAINTENANCE_INTERVAL=0 disables it)."""
+    global _maintenance_task
+    if _maintenance_task is None and MAINTENANCE_INTERVAL > 0:
+        _maintenance_task = asyncio.create_task(_maintenance_loop(upload_dir))
+
+async def stop():
+    global _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        await asyncio.gather(_maintenance_task, return_exceptions=True)
+        _maintenance_task = None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upload-dir", default=os.getenv("UPLOAD_DIR", "uploads"), help="Upload directory to clean")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM regardless of free space")
+    args = parser.parse_args()
+
+    db.init_db(Path(args.upload_dir))
+    result = asyncio.run(run_maintenance(Path(args.upload_dir), vacuum=args.vacuum))
+    claim_run("maintenance", 0)
+    record_result("maintenance", result)
+    db.close()
+
+if __name__ == "__main__":
+    main()
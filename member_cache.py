@@ -0,0 +1,93 @@
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import db
+
+# Organization members cache configuration
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "256"))
+MEMBER_CACHE_TTL = float(os.getenv("MEMBER_CACHE_TTL", "3600"))
+MEMBER_CACHE_PERSIST = os.getenv("MEMBER_CACHE_PERSIST", "true").lower() == "true"
+
+class CacheEntry(NamedTuple):
+    pages: List[List[str]]  # Member logins, one list per API page
+    etags: List[Optional[str]]  # ETag of each page, for If-None-Match revalidation
+    fetched_at: float  # When the entry was last fetched or revalidated
+
+    @property
+    def members(self) -> List[str]:
+        return [login for page in self.pages for login in page]
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.fetched_at < MEMBER_CACHE_TTL
+
+# In-memory LRU, keyed by lower-cased organization name
+_entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+cache_stats = {"hits": 0, "misses": 0, "revalidated": 0}
+
+def _key(org_name: str) -> str:
+    return org_name.lower()
+
+def _load(key: str) -> Optional[CacheEntry]:
+    """Load a persisted entry from the database."""
+    try:
+        with db.connect() as conn:
+            row = conn.execute(
+                "SELECT pages, etags, fetched_at FROM github_member_cache WHERE org = ?", (key,)
+            ).fetchone()
+    except sqlite3.OperationalError:
+        # Table not created yet (database not initialized)
+        return None
+    if not row:
+        return None
+    return CacheEntry(json.loads(row[0]), json.loads(row[1]), row[2])
+
+def _store(key: str, entry: CacheEntry):
+    """Persist an entry so it survives restarts."""
+    try:
+        with db.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO github_member_cache (org, pages, etags, fetched_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry.pages), json.dumps(entry.etags), entry.fetched_at)
+            )
+    except sqlite3.OperationalError as e:
+        print(f"Could not persist member cache entry for {key}: {e}")
+
+async def get(org_name: str) -> Optional[CacheEntry]:
+    """Return the cached entry for an organization (fresh or stale), if any."""
+    key = _key(org_name)
+    entry = _entries.get(key)
+    if entry is not None:
+        _entries.move_to_end(key)
+        return entry
+    
+    if MEMBER_CACHE_PERSIST:
+        entry = await db.run(_load, key)
+        if entry is not None:
+            _remember(key, entry)
+    return entry
+
+async def put(org_name: str, entry: CacheEntry):
+    """Store or refresh an organization's entry."""
+    key = _key(org_name)
+    _remember(key, entry)
+    if MEMBER_CACHE_PERSIST:
+        await db.run(_store, key, entry)
+
+def _remember(key: str, entry: CacheEntry):
+    _entries[key] = entry
+    _entries.move_to_end(key)
+    while len(_entries) > MEMBER_CACHE_SIZE:
+        _entries.popitem(last=False)
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Cache counters for status reporting."""
+    lookups = cache_stats["hits"] + cache_stats["misses"] + cache_stats["revalidated"]
+    return {
+        **cache_stats,
+        "entries": len(_entries),
+        "hit_ratio": round((cache_stats["hits"] + cache_stats["revalidated"]) / lookups, 3) if lookups else None,
+    }
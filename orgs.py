@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Organizations and their member lists are stored once instead of on every
+# job: each organization is a row in orgs, each distinct member list it
+# has had is a row in member_snapshots (deduplicated by content hash), and
+# jobs reference both by ID. Snapshots never change once written, so
+# parsed member lists are cached in memory by snapshot ID.
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "64"))
+
+# snapshot_id -> member logins, most recently used last
+_snapshots: "OrderedDict[int, List[str]]" = OrderedDict()
+_snapshots_lock = threading.Lock()  # load_members runs on the database thread pool
+
+def members_hash(members_json: str) -> str:
+    return hashlib.sha256(members_json.encode()).hexdigest()
+
+def get_org_id(conn: sqlite3.Connection, username: str, create: bool = False) -> Optional[int]:
+    """ID of an organization (names are case-insensitive), creating it if asked."""
+    if create:
+        conn.execute("INSERT INTO orgs (username) VALUES (?) ON CONFLICT (username) DO NOTHING", (username,))
+    row = conn.execute("SELECT org_id FROM orgs WHERE username = ?", (username,)).fetchone()
+    return row[0] if row else None
+
+def save_snapshot(conn: sqlite3.Connection, org_username: str, members: List[str]) -> Tuple[int, Optional[int]]:
+    """
+    Record an organization and its current member list using the caller's
+    connection. A member list identical to one stored before reuses that
+    snapshot. Returns (org_id, snapshot_id); snapshot_id is None when the
+    organization has no public members.
+    """
+    org_id = get_org_id(conn, org_username, create=True)
+    if not members:
+        return org_id, None
+
+    members_json = json.dumps(members)
+    digest = members_hash(members_json)
+    conn.execute(
+        """INSERT INTO member_snapshots (org_id, members_hash, members, member_count, created_at)
+           VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT (org_id, members_hash) DO NOTHING""",
+        (org_id, digest, members_json, len(members), time.time())
+    )
+    snapshot_id = conn.execute(
+        "SELECT snapshot_id FROM member_snapshots WHERE org_id = ? AND members_hash = ?", (org_id, digest)
+    ).fetchone()[0]
+    conn.execute("UPDATE orgs SET latest_snapshot_id = ? WHERE org_id = ?", (snapshot_id, org_id))
+    return org_id, snapshot_id
+
+def load_members(conn: sqlite3.Connection, snapshot_ids: Iterable[Optional[int]]) -> Dict[int, List[str]]:
+    """Member lists of the given snapshots, parsing only those not cached yet."""
+    found = {}
+    missing = []
+    with _snapshots_lock:
+        for snapshot_id in set(snapshot_ids):
+            if snapshot_id is None:
+                continue
+            members = _snapshots.get(snapshot_id)
+            if members is None:
+                missing.append(snapshot_id)
+            else:
+                _snapshots.move_to_end(snapshot_id)
+                found[snapshot_id] = members
+
+    if missing:
+        rows = conn.execute(
+            f"SELECT snapshot_id, members FROM member_snapshots WHERE snapshot_id IN ({','.join('?' * len(missing))})",
+            missing
+        ).fetchall()
+        for snapshot_id, members_json in rows:
+            found[snapshot_id] = _remember(snapshot_id, json.loads(members_json))
+    return found
+
+def _remember(snapshot_id: int, members: List[str]) -> List[str]:
+    with _snapshots_lock:
+        _snapshots[snapshot_id] = members
+        _snapshots.move_to_end(snapshot_id)
+        while len(_snapshots) > SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)
+    return members
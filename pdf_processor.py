@@ -1,87 +1,140 @@
 import re
-import requests
+import threading
+import time
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Any, Dict, Iterator, NamedTuple, Optional, List
 import pdfplumber
+import pypdfium2
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF file."""
-    text = ""
-    try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text
-    except Exception as e:
-        raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+# All organization patterns in one pass. At the same position the
+# alternatives are tried in order, so github.com/orgs/<org> wins over
+# the plain github.com/<org> form.
+GITHUB_ORG_PATTERN = re.compile(
+    r'github\.com/orgs/([a-zA-Z0-9_-]+)(?:/|$|\s)'  # github.com/orgs/org
+    r'|github\.com/([a-zA-Z0-9_-]+)(?:/|$|\s)'  # github.com/org
+    r'|@([a-zA-Z0-9_-]+)\s+on\s+GitHub'  # @org on GitHub
+    r'|GitHub\s+organization[:\s]+([a-zA-Z0-9_-]+)'  # GitHub organization: org
+    r'|GitHub\s+org[:\s]+([a-zA-Z0-9_-]+)',  # GitHub org: org
+    re.IGNORECASE
+)
+
+# Organization in a link target (https://github.com/<org> or github.com/orgs/<org>)
+GITHUB_LINK_PATTERN = re.compile(r'github\.com/(?:orgs/)?([a-zA-Z0-9_-]+)', re.IGNORECASE)
+
+# Common false positives
+IGNORED_ORG_NAMES = {'github', 'http', 'https', 'www', 'com', 'orgs'}
+
+class ExtractionResult(NamedTuple):
+    org_name: Optional[str]
+    pages_parsed: int  # Pages whose text was extracted before a match was found
+    page_count: int
+    method: str  # What resolved the org: "link", "text" or "none"
+    parse_seconds: float = 0.0  # Time spent in pdfplumber (links and page text)
+    match_seconds: float = 0.0  # Time spent matching organization patterns
+    spans: Optional[List[Dict[str, Any]]] = None  # Timing spans, when profiled (see profiling.py)
+    profile: Optional[str] = None  # cProfile summary, when profiled
+
+# PDFium is not thread-safe, and uploads count pages on worker threads
+_pdfium_lock = threading.Lock()
+
+def count_pdf_pages(file_path: str) -> Optional[int]:
+    """
+    Page count from the document's page tree (no page is parsed), cheap
+    enough to run at upload time. None if the file cannot be opened.
+    """
+    with _pdfium_lock:
+        try:
+            pdf = pypdfium2.PdfDocument(file_path)
+        except Exception:
+            return None
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+def find_github_org_in_links(pdf: pdfplumber.PDF) -> Optional[str]:
+    """
+    Look for a GitHub organization in the link annotations (URI actions)
+    of every page. Annotations are read without any layout analysis, so
+    this is far cheaper than extracting text.
+    """
+    for page in pdf.pages:
+        for link in page.hyperlinks:
+            match = GITHUB_LINK_PATTERN.search(link.get("uri") or "")
+            if match and match.group(1).lower() not in IGNORED_ORG_NAMES:
+                return match.group(1)
+    return None
+
+def iter_page_texts(pdf: pdfplumber.PDF) -> Iterator[str]:
+    """Yield the text of each page of an open PDF lazily, one page at a time."""
+    for page in pdf.pages:
+        page_text = page.extract_text() or ""
+        # Drop parsed layout objects so memory stays flat on long documents
+        page.flush_cache()
+        yield page_text
 
 def extract_github_org(text: str) -> Optional[str]:
     """Extract GitHub organization from text using regex patterns."""
-    # Common patterns for GitHub organization mentions
-    patterns = [
-        r'github\.com/([a-zA-Z0-9-_]+)(?:/|$|\s)',  # github.com/org
-        r'github\.com/orgs/([a-zA-Z0-9-_]+)(?:/|$|\s)',  # github.com/orgs/org
-        r'@([a-zA-Z0-9-_]+)\s+on\s+GitHub',  # @org on GitHub
-        r'GitHub\s+organization[:\s]+([a-zA-Z0-9-_]+)',  # GitHub organization: org
-        r'GitHub\s+org[:\s]+([a-zA-Z0-9-_]+)',  # GitHub org: org
-    ]
-    
-    for pattern in patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            org = match.group(1)
-            # Filter out common false positives
-            if org and org.lower() not in ['github', 'http', 'https', 'www', 'com']:
-                return org
+    for match in GITHUB_ORG_PATTERN.finditer(text):
+        org = next(group for group in match.groups() if group)
+        if org.lower() not in IGNORED_ORG_NAMES:
+            return org
     
     return None
 
-def fetch_github_members(org_name: str) -> List[str]:
-    """Fetch public members of a GitHub organization."""
-    url = f"https://api.github.com/orgs/{org_name}/public_members"
-    
-    try:
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code == 404:
-            # Organization not found or no public members
-            return []
-        
-        if response.status_code == 200:
-            members_data = response.json()
-            return [member['login'] for member in members_data]
-        
-        # Handle rate limiting or other errors
-        response.raise_for_status()
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching GitHub members: {e}")
-        return []
-    
-    return []
+def _add_span(spans: List[Dict[str, Any]], name: str, started: float, **attributes):
+    """Record a span that started at perf_counter() time started and ends now."""
+    seconds = time.perf_counter() - started
+    spans.append({"name": name, "start": time.time() - seconds, "seconds": seconds, **attributes})
 
-def process_pdf_file(file_path: str) -> Tuple[Optional[str], List[str]]:
+def extract_org_from_pdf(file_path: str, spans: Optional[List[Dict[str, Any]]] = None) -> ExtractionResult:
     """
-    Main function to process PDF file and extract GitHub organization info.
+    CPU-bound half of PDF processing: find the GitHub organization.
+    Kept free of network I/O so it can run inside the extraction process pool.
     
-    Returns:
-        Tuple of (organization_name, list_of_members)
+    Clickable github.com links are checked first. Only when there are none
+    is text extracted, one page at a time, stopping at the first page that
+    mentions an organization. When a spans list is given, the link scan and
+    each page's text extraction and regex scan are recorded in it.
     """
-    # Extract text from PDF
-    text = extract_text_from_pdf(file_path)
-    
-    if not text.strip():
-        raise ValueError("No text could be extracted from the PDF")
-    
-    # Extract GitHub organization
-    org_name = extract_github_org(text)
+    pages_parsed = 0
+    found_text = False
+    started = time.perf_counter()
+    match_seconds = 0.0
     
-    if not org_name:
-        return None, []
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            page_count = len(pdf.pages)
+            
+            org_name = find_github_org_in_links(pdf)
+            if spans is not None:
+                _add_span(spans, "link_scan", started, pages=page_count)
+            if org_name:
+                return ExtractionResult(org_name, 0, page_count, "link", time.perf_counter() - started)
+            
+            page_started = time.perf_counter()
+            for page_text in iter_page_texts(pdf):
+                pages_parsed += 1
+                if spans is not None:
+                    _add_span(spans, "page_text", page_started, page=pages_parsed, characters=len(page_text))
+                if not page_text.strip():
+                    page_started = time.perf_counter()
+                    continue
+                found_text = True
+                match_started = time.perf_counter()
+                org_name = extract_github_org(page_text)
+                match_seconds += time.perf_counter() - match_started
+                if spans is not None:
+                    _add_span(spans, "regex_scan", match_started, page=pages_parsed, matched=org_name is not None)
+                page_started = time.perf_counter()
+                if org_name:
+                    return ExtractionResult(org_name, pages_parsed, page_count, "text",
+                                            time.perf_counter() - started - match_seconds, match_seconds)
+    except Exception as e:
+        raise ValueError(f"Failed to extract text from PDF: {str(e)}")
     
-    # Fetch organization members
-    members = fetch_github_members(org_name)
+    if not found_text:
+        raise ValueError("No text could be extracted from the PDF")
     
-    return org_name, members 
\ No newline at end of file
+    return ExtractionResult(None, pages_parsed, page_count, "none",
+                            time.perf_counter() - started - match_seconds, match_seconds)
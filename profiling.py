@@ -0,0 +1,112 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import db
+from pdf_processor import ExtractionResult, extract_org_from_pdf
+
+# Opt-in per-job profiling. With JOB_PROFILING=true every job records
+# timing spans for its stages (queue wait, simulated delay, extraction with
+# one span per parsed page and regex scan, each GitHub request, storing
+# the result), and its PDF extraction runs under cProfile. The spans are
+# kept for every job; the cProfile summary only for jobs whose processing
+# took longer than PROFILE_SLOW_JOB_SECONDS. Both are served by
+# GET /api/jobs/{job_id}/profile. When profiling is off, the hooks in the
+# processing code reduce to a context variable lookup.
+JOB_PROFILING = os.getenv("JOB_PROFILING", "false").lower() == "true"
+PROFILE_SLOW_JOB_SECONDS = float(os.getenv("PROFILE_SLOW_JOB_SECONDS", "60"))
+PROFILE_TOP_FUNCTIONS = 40  # Functions listed in a stored cProfile summary
+
+class Trace:
+    """Spans recorded for one job attempt."""
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.stats: Optional[str] = None
+
+# Trace of the job the current task is processing (None when not profiling)
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+def start_trace(job_id: str) -> Optional[Trace]:
+    """Start tracing the job processed by the current task, if profiling is on."""
+    if not JOB_PROFILING:
+        return None
+    trace = Trace(job_id)
+    current_trace.set(trace)
+    return trace
+
+def record(name: str, seconds: float, **attributes):
+    """
+    Add a span that ended just now and lasted seconds to the current job's
+    trace; does nothing when it is not traced.
+    """
+    trace = current_trace.get()
+    if trace is not None:
+        trace.spans.append({"name": name, "start": time.time() - seconds, "seconds": seconds, **attributes})
+
+def profile_extraction(file_path: str) -> ExtractionResult:
+    """
+    extract_org_from_pdf under cProfile, with per-page spans. Runs in the
+    extraction process pool; the spans and a text summary of the profile
+    travel back on the result.
+    """
+    spans = []
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = extract_org_from_pdf(file_path, spans)
+    finally:
+        profiler.disable()
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return result._replace(spans=spans, profile=stream.getvalue())
+
+def save_trace(trace: Trace):
+    """Store a finished trace, replacing the one of an earlier attempt."""
+    total_seconds = time.time() - trace.started_at
+    stats = trace.stats if total_seconds > PROFILE_SLOW_JOB_SECONDS else None
+    with db.connect() as conn:
+        conn.execute(
+            """INSERT INTO job_profiles (job_id, started_at, total_seconds, spans, stats) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (job_id) DO UPDATE SET
+                   started_at = excluded.started_at, total_seconds = excluded.total_seconds,
+                   spans = excluded.spans, stats = excluded.stats""",
+            (trace.job_id, trace.started_at, total_seconds, json.dumps(trace.spans), stats)
+        )
+
+def get_profile(job_id: str) -> Optional[Dict[str, Any]]:
+    """A job's stored trace, span start times given in seconds from the start of processing."""
+    with db.connect() as conn:
+        row = conn.execute(
+            """SELECT p.started_at, p.total_seconds, p.spans, p.stats, j.status
+               FROM job_profiles p JOIN jobs j ON j.job_id = p.job_id
+               WHERE p.job_id = ?""",
+            (job_id,)
+        ).fetchone()
+    if row is None:
+        return None
+
+    spans = []
+    for recorded in sorted(json.loads(row["spans"]), key=lambda recorded: recorded["start"]):
+        start = recorded.pop("start")
+        spans.append({
+            "name": recorded.pop("name"),
+            "offset_seconds": round(start - row["started_at"], 6),
+            "seconds": round(recorded.pop("seconds"), 6),
+            **recorded,
+        })
+    return {
+        "job_id": job_id,
+        "status": row["status"],
+        "started_at": row["started_at"],
+        "total_seconds": round(row["total_seconds"], 6),
+        "spans": spans,
+        "profile": row["stats"],
+    }
@@ -1,103 +1,900 @@
 import asyncio
+import os
+import socket
 import sqlite3
 import json
+import math
 import time
 import random
 from pathlib import Path
-from typing import Dict, Any
-from pdf_processor import process_pdf_file
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from extraction_pool import run_extraction, start_pool, stop_pool
+from github_client import close_client, fetch_members
+from github_rate_limit import GitHubUnavailableError
+from member_cache import get_cache_stats
+import db
+import metrics
+import orgs
+import profiling
 
-# Global task queue and worker status
-task_queue = asyncio.Queue()
+# Number of concurrent workers pulling from the queue
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+
+# Durable queue configuration: queued jobs live in the jobs table, and a
+# worker holds a lease on the job it processes. Leases are renewed while
+# the job runs; jobs whose lease expired (worker crashed or was killed)
+# are put back in the queue until they reach QUEUE_MAX_ATTEMPTS.
+QUEUE_LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "60"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+QUEUE_POLL_INTERVAL = 1.0
+QUEUE_RECOVERY_INTERVAL = 5.0  # How often expired leases and due deferred jobs are re-queued
+# Jobs deferred because GitHub was unavailable wait in "deferred" until
+# their available_at; after this many deferrals they fail
+QUEUE_MAX_DEFERRALS = int(os.getenv("QUEUE_MAX_DEFERRALS", "10"))
+
+# Identifies this process in job leases and the workers table
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+WORKER_HEARTBEAT_INTERVAL = 2.0  # Worker processes missing 3 heartbeats are considered gone
+
+# Admission control: uploads are refused with 429 once this many jobs wait
+# to be claimed (0 disables the limit)
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "1000"))
+RETRY_AFTER_DEFAULT = 60  # Seconds to suggest when no throughput has been observed
+RETRY_AFTER_MAX = 3600
+CAPACITY_CACHE_SECONDS = 2.0  # Matches the worker heartbeat the estimate is built from
+
+# Scheduling: the highest priority goes first; within it, clients take turns
+# (the one served least recently goes next) and each client's jobs run in
+# arrival order or, with COST_AWARE_SCHEDULING, smallest page count first.
+# Under cost-aware ordering a job gains one page of head start for every
+# SCHEDULING_AGING_SECONDS it waits, so large documents are not starved.
+MIN_PRIORITY = -10
+MAX_PRIORITY = 10
+COST_AWARE_SCHEDULING = os.getenv("COST_AWARE_SCHEDULING", "false").lower() == "true"
+SCHEDULING_AGING_SECONDS = float(os.getenv("SCHEDULING_AGING_SECONDS", "10"))
+
+# Simulated processing delay in seconds, drawn uniformly per job (set both to 0 to disable)
+SIMULATED_DELAY_MIN = float(os.getenv("SIMULATED_DELAY_MIN", "30"))
+SIMULATED_DELAY_MAX = float(os.getenv("SIMULATED_DELAY_MAX", "300"))
+
+# Weight of the newest sample in the queue wait / processing time moving averages
+TIMING_EWMA_ALPHA = float(os.getenv("TIMING_EWMA_ALPHA", "0.1"))
+
+# Per-stage deadlines in seconds (0 disables one); a job that misses one is
+# marked "timed_out" and its worker moves on. Extraction is bounded by
+# extraction_pool.EXTRACTION_TIMEOUT, which also kills the stuck process.
+SIMULATED_DELAY_TIMEOUT = float(os.getenv("SIMULATED_DELAY_TIMEOUT", "0"))
+GITHUB_STAGE_TIMEOUT = float(os.getenv("GITHUB_STAGE_TIMEOUT", "300"))
+
+# Cancellation: the API flags running jobs with cancel_requested and the
+# process running them stops them within CANCEL_POLL_INTERVAL
+CANCEL_POLL_INTERVAL = 1.0
+# Statuses a job can still leave
+ACTIVE_STATUSES = ("queued", "processing", "deferred")
+
+# Global worker status
 worker_running = False
+worker_tasks: List[asyncio.Task] = []
+_task_available = asyncio.Event()  # Set when this process enqueues a job, so idle workers wake early
+worker_states: Dict[str, Optional[str]] = {}  # worker name -> job_id being processed (None when idle)
+extraction_methods: Dict[str, int] = {"link": 0, "text": 0, "none": 0}  # How each job's org was resolved
+_capacity_cache: Optional[Tuple[float, Dict[str, Any]]] = None  # (expires_at, estimate_capacity() result)
+running_jobs: Dict[str, asyncio.Task] = {}  # job_id -> task processing it in this process
+_stop_reasons: Dict[str, str] = {}  # job_id -> why its task was cancelled, when not for shutdown
+_cancel_requested = asyncio.Event()  # Set when this process flags a running job, to check at once
+
+class QueueFullError(Exception):
+    """Raised when enqueueing would take the queue past MAX_QUEUE_DEPTH."""
+    def __init__(self, depth: int):
+        super().__init__(f"Queue is full ({depth} jobs waiting, limit is {MAX_QUEUE_DEPTH})")
+        self.depth = depth
+
+class JobFinishedError(Exception):
+    """Raised when cancelling a job that already reached a final status."""
+    def __init__(self, status: str):
+        super().__init__(f"Job is already {status}")
+        self.status = status
+
+JOB_QUEUE_WAIT_SECONDS = metrics.Histogram(
+    "job_queue_wait_seconds", "Time jobs spent queued before their first attempt started"
+)
+JOB_STAGE_SECONDS = metrics.Histogram(
+    "job_stage_duration_seconds",
+    "Duration of each processing stage: simulated_delay, extraction (including pool wait), "
+    "pdf_parse and org_match (inside the extraction process), github and store",
+    ["stage"]
+)
+PDF_PAGES_PARSED = metrics.Histogram(
+    "pdf_pages_parsed", "Pages whose text was extracted per document", buckets=(0, 1, 2, 5, 10, 20, 50, 100, 500)
+)
+JOBS_PROCESSED = metrics.Counter(
+    "jobs_processed_total",
+    "Job attempts by outcome (completed, failed, deferred, timed_out, cancelled or interrupted)", ["outcome"]
+)
+ORG_RESOLUTIONS = metrics.Counter(
+    "pdf_org_resolution_total", "How each document's organization was resolved (link, text or none)", ["method"]
+)
+
+def enqueue_job(conn: sqlite3.Connection, job_id: str, file_path: str, original_filename: str,
+                content_hash: Optional[str] = None, timestamp: Optional[str] = None,
+                priority: int = 0, client_id: str = "", page_count: Optional[int] = None):
+    """Insert a "queued" job row using the caller's connection (and transaction)."""
+    conn.execute(
+        """INSERT INTO jobs (job_id, original_filename, status, timestamp, content_hash, file_path, enqueued_at,
+                             priority, client_id, page_count)
+           VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?, ?)""",
+        (job_id, original_filename, timestamp or datetime.now().isoformat(), content_hash, file_path, time.time(),
+         priority, client_id, page_count)
+    )
+    print(f"Task {job_id} added to queue")
+
+def notify_task_available():
+    """Wake this process's idle workers after jobs were enqueued."""
+    _task_available.set()
+
+def _insert_task(job_id: str, file_path: str, original_filename: str,
+                 content_hash: Optional[str], timestamp: Optional[str], priority: int, client_id: str):
+    with db.connect() as conn:
+        enqueue_job(conn, job_id, file_path, original_filename, content_hash, timestamp, priority, client_id)
 
-async def add_task_to_queue(job_id: str, file_path: str, original_filename: str):
-    """Add a task to the processing queue."""
-    task = {
+async def add_task_to_queue(job_id: str, file_path: str, original_filename: str,
+                            content_hash: Optional[str] = None, timestamp: Optional[str] = None,
+                            priority: int = 0, client_id: str = ""):
+    """Add a job to the persistent queue (a "queued" row in the jobs table)."""
+    await db.run(_insert_task, job_id, file_path, original_filename, content_hash, timestamp, priority, client_id)
+    notify_task_available()
+
+def _next_job(conn: sqlite3.Connection, now: float) -> Optional[sqlite3.Row]:
+    """Pick the next job to run (see the scheduling notes at the top of this module)."""
+    turn = conn.execute(
+        """SELECT j.priority, j.client_id
+           FROM jobs j LEFT JOIN client_turns t ON t.client_id = j.client_id
+           WHERE j.status = 'queued' AND j.duplicate_of IS NULL
+           GROUP BY j.priority, j.client_id
+           ORDER BY j.priority DESC, MAX(COALESCE(t.served_at, 0)), MIN(j.enqueued_at)
+           LIMIT 1"""
+    ).fetchone()
+    if turn is None:
+        return None
+    
+    order = "enqueued_at"
+    if COST_AWARE_SCHEDULING:
+        order = "COALESCE(page_count, 1) - (? - enqueued_at) / ?, enqueued_at"
+    return conn.execute(
+        f"""SELECT job_id, file_path, original_filename, enqueued_at, attempts, client_id, extracted_company_username, deferrals
+            FROM jobs
+            WHERE status = 'queued' AND duplicate_of IS NULL AND priority = ? AND client_id = ?
+            ORDER BY {order}
+            LIMIT 1""",
+        (turn[0], turn[1], now, SCHEDULING_AGING_SECONDS) if COST_AWARE_SCHEDULING else (turn[0], turn[1])
+    ).fetchone()
+
+def claim_task(lease_owner: str) -> Optional[Dict[str, Any]]:
+    """
+    Atomically take the next queued job and lease it to lease_owner.
+    Duplicate uploads following the job move to "processing" with it.
+    """
+    now = time.time()
+    with db.transaction() as conn:
+        row = _next_job(conn, now)
+        if row is None:
+            return None
+        
+        job_id = row[0]
+        conn.execute(
+            """UPDATE jobs
+               SET status = 'processing', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1,
+                   started_at = ?
+               WHERE job_id = ?""",
+            (lease_owner, now + QUEUE_LEASE_SECONDS, now, job_id)
+        )
+        conn.execute(
+            """INSERT INTO client_turns (client_id, served_at) VALUES (?, ?)
+               ON CONFLICT (client_id) DO UPDATE SET served_at = excluded.served_at""",
+            (row[5], now)
+        )
+        # Retries keep their original enqueued_at, so only first attempts count
+        if row[4] == 0 and row[7] == 0 and row[3]:
+            record_timing(conn, "queue_wait", now - row[3])
+        conn.execute(
+            "UPDATE jobs SET status = 'processing' WHERE duplicate_of = ? AND status = 'queued'",
+            (job_id,)
+        )
+    
+    return {
         "job_id": job_id,
-        "file_path": file_path,
-        "original_filename": original_filename,
-        "timestamp": time.time()
+        "file_path": row[1],
+        "original_filename": row[2],
+        "timestamp": row[3],
+        "attempt": row[4] + 1,
+        "deferrals": row[7],
+        "org_username": row[6]  # Known when a deferred job is retried
     }
-    await task_queue.put(task)
-    print(f"Task {job_id} added to queue")
 
-async def process_task(task: Dict[str, Any]):
+def record_timing(conn: sqlite3.Connection, metric: str, seconds: float):
+    """Fold a sample into the metric's exponentially weighted moving average."""
+    conn.execute(
+        """INSERT INTO job_timings (metric, average, samples) VALUES (?, ?, 1)
+           ON CONFLICT (metric) DO UPDATE
+           SET average = average + ? * (excluded.average - average), samples = samples + 1""",
+        (metric, seconds, TIMING_EWMA_ALPHA)
+    )
+
+def get_job_timings() -> Dict[str, Dict[str, Any]]:
+    """Moving averages of queue wait and processing time, in seconds."""
+    with db.connect() as conn:
+        rows = conn.execute("SELECT metric, average, samples FROM job_timings").fetchall()
+    timings = {"queue_wait": {"average_seconds": None, "samples": 0},
+               "processing": {"average_seconds": None, "samples": 0}}
+    for metric, average, samples in rows:
+        timings[metric] = {"average_seconds": round(average, 3), "samples": samples}
+    return timings
+
+def renew_lease(job_id: str, lease_owner: str):
+    """Extend the lease on a job this worker is still processing."""
+    with db.connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE job_id = ? AND lease_owner = ?",
+            (time.time() + QUEUE_LEASE_SECONDS, job_id, lease_owner)
+        )
+
+def release_task(job_id: str):
+    """
+    Put an interrupted job back in the queue (e.g. on worker shutdown), or
+    cancel it if that was requested meanwhile.
+    """
+    with db.transaction() as conn:
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row and row[0]:
+            orphan = _cancel(conn, job_id)
+            if orphan:
+                Path(orphan).unlink(missing_ok=True)
+            return
+        conn.execute(
+            """UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires_at = NULL,
+                               attempts = MAX(attempts - 1, 0)
+               WHERE job_id = ? AND status = 'processing'""",
+            (job_id,)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'queued' WHERE duplicate_of = ? AND status = 'processing'",
+            (job_id,)
+        )
+
+def defer_job(job_id: str, available_at: float, org_username: Optional[str]) -> bool:
+    """
+    Park a job until available_at because GitHub could not be reached,
+    keeping the organization already extracted so the retry skips
+    extraction. The deferral does not count as an attempt. Returns False
+    (and fails the job) once it has been deferred QUEUE_MAX_DEFERRALS times.
+    """
+    with db.transaction() as conn:
+        row = conn.execute("SELECT deferrals FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None or row[0] >= QUEUE_MAX_DEFERRALS:
+            conn.execute(
+                """UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires_at = NULL
+                   WHERE job_id = ? OR (duplicate_of = ? AND status IN ('queued', 'processing', 'deferred'))""",
+                (job_id, job_id)
+            )
+            return False
+        org_id = orgs.get_org_id(conn, org_username, create=True) if org_username else None
+        conn.execute(
+            """UPDATE jobs SET status = 'deferred', available_at = ?, extracted_company_username = ?, org_id = ?,
+                               deferrals = deferrals + 1, attempts = MAX(attempts - 1, 0),
+                               lease_owner = NULL, lease_expires_at = NULL
+               WHERE job_id = ?""",
+            (available_at, org_username, org_id, job_id)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'deferred', available_at = ? WHERE duplicate_of = ? AND status = 'processing'",
+            (available_at, job_id)
+        )
+    return True
+
+def requeue_deferred_jobs() -> int:
+    """Move deferred jobs whose available_at has passed back to the queue."""
+    with db.connect() as conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'queued' WHERE status = 'deferred' AND available_at <= ?",
+            (time.time(),)
+        )
+        return cursor.rowcount
+
+def _cancel(conn: sqlite3.Connection, job_id: str) -> Optional[str]:
+    """
+    Mark a job cancelled using the caller's transaction. Duplicate uploads
+    waiting on it are not cancelled: the oldest takes over its file and
+    place in the queue, and the others wait on that one instead. Returns
+    the job's file when nothing needs it any more. A job that finished
+    meanwhile is left as it is.
+    """
+    job = conn.execute(
+        """SELECT file_path, duplicate_of, status, enqueued_at, available_at, extracted_company_username, org_id,
+                  deferrals, page_count
+           FROM jobs WHERE job_id = ?""",
+        (job_id,)
+    ).fetchone()
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        return None
+    conn.execute(
+        f"""UPDATE jobs SET status = 'cancelled', cancel_requested = 0, lease_owner = NULL, lease_expires_at = NULL
+            WHERE job_id = ? AND status IN ({','.join('?' * len(ACTIVE_STATUSES))})""",
+        (job_id, *ACTIVE_STATUSES)
+    )
+    if job["duplicate_of"] is not None:
+        return None
+    
+    heir = conn.execute(
+        f"""SELECT job_id FROM jobs
+            WHERE duplicate_of = ? AND status IN ({','.join('?' * len(ACTIVE_STATUSES))})
+            ORDER BY timestamp LIMIT 1""",
+        (job_id, *ACTIVE_STATUSES)
+    ).fetchone()
+    if heir is None:
+        return job["file_path"]
+    
+    status = "deferred" if job["status"] == "deferred" else "queued"
+    conn.execute(
+        """UPDATE jobs SET duplicate_of = NULL, status = ?, file_path = ?, enqueued_at = ?, available_at = ?,
+                           extracted_company_username = ?, org_id = ?, deferrals = ?, page_count = ?, attempts = 0
+           WHERE job_id = ?""",
+        (status, job["file_path"], job["enqueued_at"], job["available_at"], job["extracted_company_username"],
+         job["org_id"], job["deferrals"], job["page_count"], heir["job_id"])
+    )
+    conn.execute(
+        f"""UPDATE jobs SET duplicate_of = ?, status = ?
+            WHERE duplicate_of = ? AND status IN ({','.join('?' * len(ACTIVE_STATUSES))})""",
+        (heir["job_id"], status, job_id, *ACTIVE_STATUSES)
+    )
+    return None
+
+def cancel_job(job_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Cancel a job on behalf of its uploader. Waiting jobs (and duplicate
+    uploads, which only stop waiting) are cancelled at once; a job being
+    processed is flagged and stopped by the worker running it. Returns the
+    job's status afterwards (None if there is no such job) and a file the
+    caller should delete; raises JobFinishedError for a finished job,
+    cancelled ones included.
+    """
+    with db.transaction() as conn:
+        row = conn.execute("SELECT status, duplicate_of FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None, None
+        if row["status"] not in ACTIVE_STATUSES:
+            raise JobFinishedError(row["status"])
+        if row["status"] == "processing" and row["duplicate_of"] is None:
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+            return "processing", None
+        return "cancelled", _cancel(conn, job_id)
+
+def finish_cancelled_job(job_id: str) -> Optional[str]:
+    """Record that a worker stopped a job whose cancellation was requested."""
+    with db.transaction() as conn:
+        return _cancel(conn, job_id)
+
+def find_cancel_requests(job_ids: List[str]) -> List[str]:
+    with db.connect() as conn:
+        rows = conn.execute(
+            f"SELECT job_id FROM jobs WHERE cancel_requested = 1 AND job_id IN ({','.join('?' * len(job_ids))})",
+            job_ids
+        ).fetchall()
+    return [row[0] for row in rows]
+
+def notify_cancel_requested():
+    """Wake this process's cancellation check (the job may be running here)."""
+    _cancel_requested.set()
+
+def recover_expired_leases() -> int:
+    """
+    Re-queue jobs whose worker stopped renewing its lease, or fail them
+    once they have used up QUEUE_MAX_ATTEMPTS. Returns the number of jobs
+    recovered.
+    """
+    now = time.time()
+    with db.transaction() as conn:
+        expired = conn.execute(
+            """SELECT job_id, file_path, attempts, cancel_requested FROM jobs
+               WHERE status = 'processing' AND duplicate_of IS NULL
+                 AND (lease_expires_at IS NULL OR lease_expires_at < ?)""",
+            (now,)
+        ).fetchall()
+        # Jobs whose cancellation was pending when their worker died
+        cancelled = [_cancel(conn, row["job_id"]) for row in expired if row["cancel_requested"]]
+        expired = [row[:3] for row in expired if not row["cancel_requested"]]
+        
+        exhausted = [(job_id, file_path) for job_id, file_path, attempts in expired if attempts >= QUEUE_MAX_ATTEMPTS]
+        requeued = [job_id for job_id, _, attempts in expired if attempts < QUEUE_MAX_ATTEMPTS]
+        for job_id, _ in exhausted:
+            conn.execute(
+                """UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires_at = NULL
+                   WHERE job_id = ? OR (duplicate_of = ? AND status IN ('queued', 'processing'))""",
+                (job_id, job_id)
+            )
+        for job_id in requeued:
+            conn.execute(
+                """UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires_at = NULL
+                   WHERE job_id = ? OR (duplicate_of = ? AND status = 'processing')""",
+                (job_id, job_id)
+            )
+    
+    for job_id, file_path in exhausted:
+        print(f"Job {job_id} failed after {QUEUE_MAX_ATTEMPTS} attempts")
+        if file_path:
+            Path(file_path).unlink(missing_ok=True)
+    for orphan in cancelled:
+        if orphan:
+            Path(orphan).unlink(missing_ok=True)
+    for job_id in requeued:
+        print(f"Job {job_id} lease expired, re-queued")
+    if requeued or cancelled:
+        _task_available.set()
+    return len(expired) + len(cancelled)
+
+def count_queued(conn: sqlite3.Connection) -> int:
+    """Jobs waiting to be claimed (duplicate uploads following one are not counted)."""
+    return conn.execute(
+        "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND duplicate_of IS NULL"
+    ).fetchone()[0]
+
+def count_queued_ahead(conn: sqlite3.Connection, priority: int) -> int:
+    """Queued jobs at this priority or above: a new job's position, ignoring client turns."""
+    return conn.execute(
+        "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND duplicate_of IS NULL AND priority >= ?",
+        (priority,)
+    ).fetchone()[0]
+
+def get_queue_size() -> int:
+    """Number of jobs waiting to be claimed."""
+    with db.connect() as conn:
+        return count_queued(conn)
+
+def get_scheduling_status(max_clients: int = 20) -> Dict[str, Any]:
+    """Waiting jobs by priority and by client (the max_clients largest), for status reporting."""
+    with db.connect() as conn:
+        rows = conn.execute(
+            """SELECT priority, client_id, COUNT(*) FROM jobs
+               WHERE status = 'queued' AND duplicate_of IS NULL
+               GROUP BY priority, client_id"""
+        ).fetchall()
+    by_priority: Dict[str, int] = {}
+    by_client: Dict[str, int] = {}
+    for priority, client_id, count in rows:
+        by_priority[str(priority)] = by_priority.get(str(priority), 0) + count
+        by_client[client_id or "unknown"] = by_client.get(client_id or "unknown", 0) + count
+    largest = sorted(by_client.items(), key=lambda item: item[1], reverse=True)[:max_clients]
+    return {
+        "cost_aware": COST_AWARE_SCHEDULING,
+        "queued_by_priority": dict(sorted(by_priority.items(), key=lambda item: int(item[0]), reverse=True)),
+        "clients_waiting": len(by_client),
+        "queued_by_client": dict(largest),
+    }
+
+def check_queue_capacity(conn: sqlite3.Connection, new_jobs: int) -> int:
+    """
+    Call inside the enqueueing transaction, after inserting new_jobs jobs:
+    raises QueueFullError (rolling the transaction back) when they took the
+    queue past MAX_QUEUE_DEPTH. Returns the depth including the new jobs.
+    """
+    depth = count_queued(conn)
+    if MAX_QUEUE_DEPTH and new_jobs and depth > MAX_QUEUE_DEPTH:
+        raise QueueFullError(depth - new_jobs)
+    return depth
+
+def estimate_capacity() -> Dict[str, Any]:
+    """
+    Observed processing capacity: live worker slots (from heartbeats) and the
+    moving-average processing time, giving jobs per second. Cached for
+    CAPACITY_CACHE_SECONDS since it is read on every upload.
+    """
+    global _capacity_cache
+    now = time.time()
+    if _capacity_cache is not None and _capacity_cache[0] > now:
+        return _capacity_cache[1]
+    
+    workers = get_worker_status()
+    average = get_job_timings()["processing"]["average_seconds"]
+    if not average:
+        # Nothing processed yet: assume the simulated delay dominates
+        average = max((SIMULATED_DELAY_MIN + SIMULATED_DELAY_MAX) / 2, 1.0)
+    capacity = {
+        "concurrency": workers["concurrency"],
+        "idle": workers["idle"],
+        "average_processing_seconds": average,
+        "jobs_per_second": workers["concurrency"] / average,
+    }
+    _capacity_cache = (now + CAPACITY_CACHE_SECONDS, capacity)
+    return capacity
+
+def estimate_completion_seconds(position: int, capacity: Dict[str, Any]) -> Optional[int]:
+    """
+    Seconds until the job at this queue position (1 = next) completes: the
+    jobs ahead of it that no idle worker can take drain at the observed
+    throughput, then it takes one average processing time. None when no
+    worker is running.
+    """
+    if not capacity["jobs_per_second"]:
+        return None
+    waiting = max(position - capacity["idle"], 0)
+    return round(waiting / capacity["jobs_per_second"] + capacity["average_processing_seconds"])
+
+def estimate_job_completion_seconds(job: sqlite3.Row, capacity: Dict[str, Any]) -> Optional[int]:
+    """
+    Seconds until an unfinished job completes, from its status, started_at,
+    available_at and (while queued) queue_position. None when no worker is
+    running.
+    """
+    if not capacity["jobs_per_second"]:
+        return None
+    now = time.time()
+    if job["status"] == "processing":
+        return round(max(capacity["average_processing_seconds"] - (now - (job["started_at"] or now)), 1))
+    if job["status"] == "deferred":
+        return round(max((job["available_at"] or now) - now, 0) + capacity["average_processing_seconds"])
+    return estimate_completion_seconds(job["queue_position"], capacity)
+
+def retry_after_seconds(depth: int, capacity: Dict[str, Any]) -> int:
+    """How long until the queue should have drained below MAX_QUEUE_DEPTH."""
+    if not capacity["jobs_per_second"]:
+        return RETRY_AFTER_DEFAULT
+    excess = max(depth - MAX_QUEUE_DEPTH + 1, 1)
+    return min(max(math.ceil(excess / capacity["jobs_per_second"]), 1), RETRY_AFTER_MAX)
+
+QUEUE_DEPTH = metrics.Gauge("job_queue_depth", "Jobs waiting to be claimed (all processes)", function=get_queue_size)
+
+async def _keep_lease(job_id: str, lease_owner: str):
+    """Renew a job's lease until cancelled."""
+    while True:
+        await asyncio.sleep(QUEUE_LEASE_SECONDS / 3)
+        await db.run(renew_lease, job_id, lease_owner)
+
+async def run_stage(stage: str, awaitable, timeout: float):
+    """Await one stage of a job, raising TimeoutError past its deadline (timeout 0 means none)."""
+    if not timeout:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Stage {stage} exceeded {timeout:g} seconds")
+
+async def extract_org(job_id: str, file_path: str, worker_name: str) -> Optional[str]:
+    """Run the simulated delay and the PDF extraction of a job, returning the organization found."""
+    # Simulate long processing time (30-300 seconds by default)
+    delay = random.uniform(SIMULATED_DELAY_MIN, SIMULATED_DELAY_MAX)
+    if delay > 0:
+        print(f"[{worker_name}] Simulating {delay:.0f} second delay for job {job_id}")
+        await run_stage("simulated_delay", asyncio.sleep(delay), SIMULATED_DELAY_TIMEOUT)
+    JOB_STAGE_SECONDS.observe(delay, stage="simulated_delay")
+    profiling.record("simulated_delay", delay)
+    
+    # Actual PDF processing: parsing runs in the extraction process pool and
+    # the GitHub call on the shared async client, so neither blocks the event loop
+    trace = profiling.current_trace.get()
+    started = time.perf_counter()
+    extraction = await run_extraction(file_path, profile=trace is not None)
+    JOB_STAGE_SECONDS.observe(time.perf_counter() - started, stage="extraction")
+    if trace is not None:
+        profiling.record("extraction", time.perf_counter() - started, method=extraction.method,
+                         pages_parsed=extraction.pages_parsed, page_count=extraction.page_count)
+        trace.spans.extend(extraction.spans or [])
+        trace.stats = extraction.profile
+    JOB_STAGE_SECONDS.observe(extraction.parse_seconds, stage="pdf_parse")
+    JOB_STAGE_SECONDS.observe(extraction.match_seconds, stage="org_match")
+    PDF_PAGES_PARSED.observe(extraction.pages_parsed)
+    ORG_RESOLUTIONS.inc(method=extraction.method)
+    extraction_methods[extraction.method] += 1
+    print(f"[{worker_name}] Org resolved via {extraction.method} after parsing "
+          f"{extraction.pages_parsed}/{extraction.page_count} pages for job {job_id}")
+    return extraction.org_name
+
+async def process_task(task: Dict[str, Any], worker_name: str = "worker"):
     """Process a single task from the queue."""
     job_id = task["job_id"]
     file_path = task["file_path"]
     
-    print(f"Starting processing for job {job_id}")
+    print(f"[{worker_name}] Starting processing for job {job_id} (attempt {task.get('attempt', 1)})")
+    trace = profiling.start_trace(job_id)
+    if task.get("timestamp"):
+        queue_wait = max(time.time() - task["timestamp"], 0)
+        # Only the first claim counts, as for the queue_wait average: retries
+        # and deferred jobs coming back keep their original enqueued_at
+        if task.get("attempt", 1) == 1 and task.get("deferrals", 0) == 0:
+            JOB_QUEUE_WAIT_SECONDS.observe(queue_wait)
+        profiling.record("queue_wait", queue_wait, attempt=task.get("attempt", 1))
     
+    interrupted = False
+    keep_file = False  # Deferred jobs, and cancelled ones a duplicate upload took over, still need it
+    org_username = task.get("org_username")
     try:
-        # Update status to processing
-        update_job_status(job_id, "processing")
+        if org_username:
+            # Deferred job coming back: extraction already ran, only GitHub is left
+            print(f"[{worker_name}] Resuming job {job_id} at the GitHub lookup for {org_username}")
+        else:
+            org_username = await extract_org(job_id, file_path, worker_name)
         
-        # Simulate long processing time (30-300 seconds)
-        delay = random.randint(30, 300)
-        print(f"Simulating {delay} second delay for job {job_id}")
-        await asyncio.sleep(delay)
+        members = []
+        if org_username:
+            started = time.perf_counter()
+            members = await run_stage("github", fetch_members(org_username), GITHUB_STAGE_TIMEOUT)
+            JOB_STAGE_SECONDS.observe(time.perf_counter() - started, stage="github")
+            profiling.record("github", time.perf_counter() - started, org=org_username, members=len(members))
         
-        # Actual PDF processing
-        org_username, members = process_pdf_file(file_path)
+        # Update database with results (duplicate uploads waiting on this job included)
+        started = time.perf_counter()
+        if not await db.run(complete_job, job_id, org_username, members):
+            # Cancelled or taken back meanwhile; whoever did that decides about the file
+            keep_file = True
+            print(f"[{worker_name}] Job {job_id} finished but is no longer ours, result dropped")
+            return
+        JOB_STAGE_SECONDS.observe(time.perf_counter() - started, stage="store")
+        profiling.record("store", time.perf_counter() - started)
+        JOBS_PROCESSED.inc(outcome="completed")
         
-        # Update database with results
-        conn = sqlite3.connect("jobs.db")
-        conn.execute(
-            """UPDATE jobs 
-               SET extracted_company_username = ?, github_members = ?, status = ? 
-               WHERE job_id = ?""",
-            (org_username, json.dumps(members) if members else None, "completed", job_id)
-        )
-        conn.commit()
-        conn.close()
+        print(f"[{worker_name}] Job {job_id} completed successfully")
+        
+    except GitHubUnavailableError as e:
+        # Rate limited or GitHub down: park the job instead of completing it without members
+        keep_file = await db.run(defer_job, job_id, e.retry_at, org_username)
+        if keep_file:
+            JOBS_PROCESSED.inc(outcome="deferred")
+            print(f"[{worker_name}] Job {job_id} deferred for {max(e.retry_at - time.time(), 0):.0f} seconds: {str(e)}")
+        else:
+            JOBS_PROCESSED.inc(outcome="failed")
+            print(f"[{worker_name}] Job {job_id} failed after {QUEUE_MAX_DEFERRALS} deferrals: {str(e)}")
         
-        print(f"Job {job_id} completed successfully")
+    except TimeoutError as e:
+        print(f"[{worker_name}] Job {job_id} timed out: {str(e)}")
+        JOBS_PROCESSED.inc(outcome="timed_out")
+        keep_file = not await db.run(update_job_status, job_id, "timed_out")
+        
+    except asyncio.CancelledError:
+        if _stop_reasons.pop(job_id, None) == "cancelled":
+            # Cancelled through the API: record it and free this worker
+            JOBS_PROCESSED.inc(outcome="cancelled")
+            keep_file = await asyncio.shield(db.run(finish_cancelled_job, job_id)) is None
+            if keep_file:
+                _task_available.set()  # A duplicate upload took the job's place in the queue
+            print(f"[{worker_name}] Job {job_id} cancelled")
+            return
+        # Worker shutting down: hand the job back instead of losing it
+        JOBS_PROCESSED.inc(outcome="interrupted")
+        interrupted = True
+        await asyncio.shield(db.run(release_task, job_id))
+        print(f"[{worker_name}] Job {job_id} interrupted, returned to queue")
+        raise
         
     except Exception as e:
-        print(f"Job {job_id} failed: {str(e)}")
+        print(f"[{worker_name}] Job {job_id} failed: {str(e)}")
+        JOBS_PROCESSED.inc(outcome="failed")
         # Update job status to failed
-        update_job_status(job_id, "failed")
+        keep_file = not await db.run(update_job_status, job_id, "failed")
         
     finally:
-        # Clean up file
+        # Clean up file (kept for interrupted and deferred jobs, which will run again)
         file_path_obj = Path(file_path)
-        if file_path_obj.exists():
+        if not interrupted and not keep_file and file_path_obj.exists():
             file_path_obj.unlink()
-            print(f"Cleaned up file for job {job_id}")
+            print(f"[{worker_name}] Cleaned up file for job {job_id}")
+        if trace is not None and not interrupted:
+            try:
+                await db.run(profiling.save_trace, trace)
+            except Exception as e:
+                print(f"[{worker_name}] Failed to save profile of job {job_id}: {str(e)}")
 
-def update_job_status(job_id: str, status: str):
-    """Update job status in database."""
-    conn = sqlite3.connect("jobs.db")
-    conn.execute("UPDATE jobs SET status = ? WHERE job_id = ?", (status, job_id))
-    conn.commit()
-    conn.close()
+def complete_job(job_id: str, org_username: Optional[str], members: List[str]) -> bool:
+    """
+    Store a job's result, along with duplicate uploads waiting on it. The
+    member list is stored once per organization version (see orgs.py).
+    Returns False, storing nothing, if the job is no longer being processed
+    (e.g. it was cancelled meanwhile).
+    """
+    with db.transaction() as conn:
+        job = conn.execute("SELECT status, started_at FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if job is None or job["status"] != "processing":
+            return False
+        if job["started_at"]:
+            record_timing(conn, "processing", time.time() - job["started_at"])
+        org_id, snapshot_id = orgs.save_snapshot(conn, org_username, members) if org_username else (None, None)
+        conn.execute(
+            """UPDATE jobs 
+               SET extracted_company_username = ?, org_id = ?, members_snapshot_id = ?, github_members = NULL,
+                   status = ?, lease_owner = NULL, lease_expires_at = NULL
+               WHERE (job_id = ? AND status = 'processing')
+                  OR (duplicate_of = ? AND status IN ('queued', 'processing', 'deferred'))""",
+            (org_username, org_id, snapshot_id, "completed", job_id, job_id)
+        )
+        return True
 
-async def task_worker():
-    """Background worker that processes tasks from the queue."""
-    global worker_running
-    worker_running = True
-    print("Task worker started")
+def update_job_status(job_id: str, status: str) -> bool:
+    """
+    Record the final status of a job being processed, along with duplicate
+    uploads waiting on it. Returns False if the job is no longer being
+    processed.
+    """
+    with db.transaction() as conn:
+        updated = conn.execute(
+            """UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL
+               WHERE job_id = ? AND status = 'processing'""",
+            (status, job_id)
+        ).rowcount
+        if updated:
+            conn.execute(
+                "UPDATE jobs SET status = ? WHERE duplicate_of = ? AND status IN ('queued', 'processing', 'deferred')",
+                (status, job_id)
+            )
+        return bool(updated)
+
+async def task_worker(worker_name: str):
+    """Background worker that claims and processes jobs from the queue."""
+    worker_states[worker_name] = None
+    lease_owner = f"{WORKER_ID}/{worker_name}"
+    print(f"[{worker_name}] Task worker started")
     
     while worker_running:
         try:
-            # Wait for a task with timeout
-            task = await asyncio.wait_for(task_queue.get(), timeout=1.0)
-            await process_task(task)
-            task_queue.task_done()
-            
-        except asyncio.TimeoutError:
-            # No tasks available, continue loop
+            _task_available.clear()
+            task = await db.run(claim_task, lease_owner)
+        except Exception as e:
+            print(f"[{worker_name}] Worker error: {str(e)}")
+            task = None
+        
+        if task is None:
+            # Nothing queued: wait for a local enqueue or the next poll
+            try:
+                await asyncio.wait_for(_task_available.wait(), timeout=QUEUE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
             continue
+        
+        worker_states[worker_name] = task["job_id"]
+        lease_keeper = asyncio.create_task(_keep_lease(task["job_id"], lease_owner))
+        # Its own task, so cancelling the job (see cancellation_loop) leaves the worker running
+        job = asyncio.create_task(process_task(task, worker_name))
+        running_jobs[task["job_id"]] = job
+        try:
+            await job
+        except Exception as e:
+            print(f"[{worker_name}] Worker error: {str(e)}")
+        finally:
+            running_jobs.pop(task["job_id"], None)
+            lease_keeper.cancel()
+            worker_states[worker_name] = None
+    
+    worker_states.pop(worker_name, None)
+    print(f"[{worker_name}] Task worker stopped")
+
+async def lease_recovery_loop():
+    """Periodically re-queue jobs abandoned by crashed workers, and deferred jobs that are due."""
+    while worker_running:
+        await asyncio.sleep(QUEUE_RECOVERY_INTERVAL)
+        try:
+            await db.run(recover_expired_leases)
+            if await db.run(requeue_deferred_jobs):
+                _task_available.set()
         except Exception as e:
-            print(f"Worker error: {str(e)}")
+            print(f"Lease recovery error: {str(e)}")
+
+async def cancellation_loop():
+    """Stop jobs running in this process whose cancellation was requested (through any API process)."""
+    while worker_running:
+        try:
+            await asyncio.wait_for(_cancel_requested.wait(), timeout=CANCEL_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _cancel_requested.clear()
+        if not running_jobs:
             continue
+        try:
+            for job_id in await db.run(find_cancel_requests, list(running_jobs)):
+                job = running_jobs.get(job_id)
+                if job is not None and job_id not in _stop_reasons:
+                    _stop_reasons[job_id] = "cancelled"
+                    job.cancel()
+        except Exception as e:
+            print(f"Cancellation check error: {str(e)}")
 
-async def start_worker():
-    """Start the background worker."""
-    asyncio.create_task(task_worker())
+async def start_worker(concurrency: Optional[int] = None):
+    """Start the background worker pool."""
+    global worker_running
+    if worker_running:
+        return
+    
+    concurrency = concurrency or WORKER_CONCURRENCY
+    if concurrency < 1:
+        raise ValueError("Worker concurrency must be at least 1")
+    
+    # Jobs left "processing" by a previous run get their lease checked first
+    recovered = await db.run(recover_expired_leases)
+    if recovered:
+        print(f"Recovered {recovered} jobs from expired leases")
+    
+    await start_pool()
+    worker_running = True
+    for i in range(concurrency):
+        worker_tasks.append(asyncio.create_task(task_worker(f"worker-{i + 1}")))
+    worker_tasks.append(asyncio.create_task(lease_recovery_loop()))
+    worker_tasks.append(asyncio.create_task(heartbeat_loop()))
+    worker_tasks.append(asyncio.create_task(cancellation_loop()))
+    print(f"Started {concurrency} task workers")
 
 async def stop_worker():
-    """Stop the background worker."""
+    """Stop the background worker pool."""
     global worker_running
-    worker_running = False 
\ No newline at end of file
+    worker_running = False
+    
+    # Workers mid-job are cancelled; idle ones exit on their next poll
+    for task in worker_tasks:
+        task.cancel()
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+    worker_tasks.clear()
+    worker_states.clear()
+    await db.run(remove_heartbeat)
+    await stop_pool()
+    await close_client()
+
+def record_heartbeat():
+    """Publish this process's workers and counters to the workers table."""
+    busy = {name: job_id for name, job_id in worker_states.items() if job_id}
+    stats = {"member_cache": get_cache_stats(), "extraction_methods": extraction_methods}
+    with db.connect() as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO workers
+               (worker_id, hostname, pid, concurrency, busy, active_jobs, stats, heartbeat_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (WORKER_ID, socket.gethostname(), os.getpid(), len(worker_states), len(busy),
+             json.dumps(busy), json.dumps(stats), time.time())
+        )
+
+def remove_heartbeat():
+    with db.connect() as conn:
+        conn.execute("DELETE FROM workers WHERE worker_id = ?", (WORKER_ID,))
+
+async def heartbeat_loop():
+    """Keep this process's row in the workers table current."""
+    while worker_running:
+        try:
+            await db.run(record_heartbeat)
+        except Exception as e:
+            print(f"Heartbeat error: {str(e)}")
+        await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+def get_worker_status() -> Dict[str, Any]:
+    """
+    Summarize every live worker process (API-embedded or standalone) from
+    the workers table, for status reporting.
+    """
+    with db.connect() as conn:
+        rows = conn.execute(
+            """SELECT worker_id, concurrency, busy, active_jobs, stats FROM workers
+               WHERE heartbeat_at >= ?""",
+            (time.time() - 3 * WORKER_HEARTBEAT_INTERVAL,)
+        ).fetchall()
+    
+    active_jobs = {}
+    member_cache = {"hits": 0, "misses": 0, "revalidated": 0, "entries": 0}
+    methods = {"link": 0, "text": 0, "none": 0}
+    for worker_id, _, _, jobs, stats in rows:
+        for name, job_id in json.loads(jobs).items():
+            active_jobs[f"{worker_id}/{name}"] = job_id
+        stats = json.loads(stats)
+        for key in member_cache:
+            member_cache[key] += stats["member_cache"].get(key, 0)
+        for key in methods:
+            methods[key] += stats["extraction_methods"].get(key, 0)
+    
+    lookups = member_cache["hits"] + member_cache["misses"] + member_cache["revalidated"]
+    member_cache["hit_ratio"] = (
+        round((member_cache["hits"] + member_cache["revalidated"]) / lookups, 3) if lookups else None
+    )
+    concurrency = sum(row[1] for row in rows)
+    busy = sum(row[2] for row in rows)
+    return {
+        "processes": len(rows),
+        "concurrency": concurrency,
+        "busy": busy,
+        "idle": concurrency - busy,
+        "active_jobs": active_jobs,
+        "member_cache": member_cache,
+        "extraction_methods": methods,
+    }
@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Configuration is read at import time, so it is set before any app module
+# is imported: a scratch upload directory, API-only mode and no background
+# maintenance or member cache persistence
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="uploads-"))
+os.environ["RUN_WORKERS"] = "false"
+os.environ["MAINTENANCE_INTERVAL"] = "0"
+os.environ["MEMBER_CACHE_PERSIST"] = "false"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db  # noqa: E402
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh database file for one test."""
+    db.close()
+    monkeypatch.setattr(db, "DATABASE_FILE", str(tmp_path / "jobs.db"))
+    db.init_db(tmp_path)
+    yield tmp_path
+    db.close()
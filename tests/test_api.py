@@ -0,0 +1,50 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import db
+import main
+import task_queue
+
+@pytest.fixture
+def client(database):
+    with TestClient(main.app) as client:
+        yield client
+
+def add_job(job_id: str, status: str):
+    with db.connect() as conn:
+        task_queue.enqueue_job(conn, job_id, str(main.UPLOAD_DIR / f"{job_id}.pdf"), f"{job_id}.pdf")
+        conn.execute("UPDATE jobs SET status = ? WHERE job_id = ?", (status, job_id))
+
+def test_cancel_queued_job(client):
+    add_job("a", "queued")
+    (main.UPLOAD_DIR / "a.pdf").write_bytes(b"%PDF-1.4")
+
+    response = client.delete("/api/jobs/a")
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+    assert not (main.UPLOAD_DIR / "a.pdf").exists()
+
+def test_cancel_running_job_is_accepted(client):
+    add_job("a", "queued")
+    task_queue.claim_task("worker-1")
+
+    response = client.post("/api/jobs/a/cancel")
+    assert response.status_code == 202
+    assert client.get("/api/jobs/a").json()["message"] == "Cancellation requested; the job is being stopped"
+
+@pytest.mark.parametrize("status", ["completed", "failed", "timed_out", "cancelled"])
+def test_cancel_finished_job_conflicts(client, status):
+    add_job("a", status)
+
+    response = client.delete("/api/jobs/a")
+    assert response.status_code == 409
+    assert response.json()["detail"] == f"Job is already {status}"
+
+def test_cancel_twice_conflicts(client):
+    add_job("a", "queued")
+
+    assert client.delete("/api/jobs/a").status_code == 200
+    assert client.delete("/api/jobs/a").status_code == 409
+
+def test_cancel_unknown_job(client):
+    assert client.delete("/api/jobs/missing").status_code == 404
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+import extraction_pool
+
+def sleep_then_report(file_path: str) -> int:
+    """Stand-in extraction: the "path" is how long to take; returns the child's pid."""
+    time.sleep(float(file_path))
+    return os.getpid()
+
+@pytest.fixture
+def run_with_pool(monkeypatch):
+    """Run a coroutine against a one-process pool whose jobs sleep instead of parsing."""
+    monkeypatch.setattr(extraction_pool, "extract_org_from_pdf", sleep_then_report)
+
+    def run(coroutine_function):
+        async def with_pool():
+            await extraction_pool.start_pool(1)
+            try:
+                return await coroutine_function()
+            finally:
+                await extraction_pool.stop_pool()
+        return asyncio.run(with_pool())
+    return run
+
+def test_deadline_starts_when_a_child_takes_the_job(run_with_pool):
+    async def scenario():
+        pool = extraction_pool._get_pool()
+        # The second job waits 1.5 seconds for the only child: past its own
+        # deadline if the wait counted
+        results = await asyncio.gather(
+            extraction_pool.run_extraction("1.5", timeout=5),
+            extraction_pool.run_extraction("0.1", timeout=1),
+        )
+        return results, extraction_pool._get_pool() is pool
+
+    (first, second), same_pool = run_with_pool(scenario)
+    assert first == second
+    assert same_pool
+
+def test_timed_out_job_does_not_fail_queued_job(run_with_pool):
+    async def scenario():
+        return await asyncio.gather(
+            extraction_pool.run_extraction("30", timeout=1),
+            extraction_pool.run_extraction("0.1", timeout=5),
+            return_exceptions=True,
+        )
+
+    stuck, queued = run_with_pool(scenario)
+    assert isinstance(stuck, TimeoutError)
+    assert isinstance(queued, int)
+
+def test_cancelling_queued_job_leaves_pool_alone(run_with_pool):
+    async def scenario():
+        pool = extraction_pool._get_pool()
+        running = asyncio.create_task(extraction_pool.run_extraction("1"))
+        queued = asyncio.create_task(extraction_pool.run_extraction("1"))
+        await asyncio.sleep(0.3)
+        queued.cancel()
+        return await running, extraction_pool._get_pool() is pool
+
+    pid, same_pool = run_with_pool(scenario)
+    assert isinstance(pid, int)
+    assert same_pool
@@ -0,0 +1,154 @@
+import time
+
+import pytest
+
+import db
+import task_queue
+from task_queue import JobFinishedError
+
+def enqueue(job_id: str, file_path: str = "") -> str:
+    with db.connect() as conn:
+        task_queue.enqueue_job(conn, job_id, file_path or f"/uploads/{job_id}.pdf", f"{job_id}.pdf")
+    return job_id
+
+def add_duplicate(job_id: str, original: str, timestamp: str):
+    with db.connect() as conn:
+        conn.execute(
+            """INSERT INTO jobs (job_id, original_filename, status, timestamp, duplicate_of)
+               VALUES (?, ?, 'queued', ?, ?)""",
+            (job_id, f"{job_id}.pdf", timestamp, original)
+        )
+
+def job(job_id: str):
+    with db.connect() as conn:
+        return conn.execute(
+            "SELECT status, file_path, duplicate_of, attempts, cancel_requested FROM jobs WHERE job_id = ?",
+            (job_id,)
+        ).fetchone()
+
+def expire_lease(job_id: str):
+    with db.connect() as conn:
+        conn.execute("UPDATE jobs SET lease_expires_at = ? WHERE job_id = ?", (time.time() - 1, job_id))
+
+def test_expired_lease_is_requeued(database):
+    enqueue("a")
+    assert task_queue.claim_task("worker-1")["job_id"] == "a"
+    expire_lease("a")
+
+    assert task_queue.recover_expired_leases() == 1
+    assert job("a")["status"] == "queued"
+    assert task_queue.claim_task("worker-2")["attempt"] == 2
+
+def test_live_lease_is_left_alone(database):
+    enqueue("a")
+    task_queue.claim_task("worker-1")
+
+    assert task_queue.recover_expired_leases() == 0
+    assert job("a")["status"] == "processing"
+
+def test_expired_lease_fails_job_out_of_attempts(database):
+    enqueue("a")
+    add_duplicate("b", "a", "2030-01-01T00:00:00")
+    task_queue.claim_task("worker-1")
+    with db.connect() as conn:
+        conn.execute("UPDATE jobs SET attempts = ? WHERE job_id = 'a'", (task_queue.QUEUE_MAX_ATTEMPTS,))
+    expire_lease("a")
+
+    task_queue.recover_expired_leases()
+    assert job("a")["status"] == "failed"
+    assert job("b")["status"] == "failed"
+
+def test_expired_lease_with_pending_cancellation_is_cancelled(database):
+    enqueue("a")
+    task_queue.claim_task("worker-1")
+    assert task_queue.cancel_job("a") == ("processing", None)
+    expire_lease("a")
+
+    task_queue.recover_expired_leases()
+    assert job("a")["status"] == "cancelled"
+
+def test_cancel_queued_job(database):
+    enqueue("a", "/uploads/a.pdf")
+
+    assert task_queue.cancel_job("a") == ("cancelled", "/uploads/a.pdf")
+    assert job("a")["status"] == "cancelled"
+    assert task_queue.claim_task("worker-1") is None
+
+def test_cancel_queued_job_hands_file_to_oldest_duplicate(database):
+    enqueue("a", "/uploads/a.pdf")
+    add_duplicate("late", "a", "2030-01-02T00:00:00")
+    add_duplicate("early", "a", "2030-01-01T00:00:00")
+
+    # The file is still needed, so it is not returned for deletion
+    assert task_queue.cancel_job("a") == ("cancelled", None)
+    heir = job("early")
+    assert (heir["status"], heir["file_path"], heir["duplicate_of"]) == ("queued", "/uploads/a.pdf", None)
+    assert job("late")["duplicate_of"] == "early"
+    assert task_queue.claim_task("worker-1")["job_id"] == "early"
+
+def test_cancel_duplicate_leaves_original_running(database):
+    enqueue("a")
+    add_duplicate("b", "a", "2030-01-01T00:00:00")
+    task_queue.claim_task("worker-1")
+
+    assert task_queue.cancel_job("b") == ("cancelled", None)
+    assert job("a")["status"] == "processing"
+
+def test_cancel_running_job_is_requested_then_finished_by_worker(database):
+    enqueue("a", "/uploads/a.pdf")
+    add_duplicate("b", "a", "2030-01-01T00:00:00")
+    task_queue.claim_task("worker-1")
+
+    assert task_queue.cancel_job("a") == ("processing", None)
+    assert job("a")["cancel_requested"] == 1
+    assert task_queue.find_cancel_requests(["a", "b"]) == ["a"]
+
+    # The worker stops the job; the duplicate takes over its file
+    assert task_queue.finish_cancelled_job("a") is None
+    assert job("a")["status"] == "cancelled"
+    heir = job("b")
+    assert (heir["status"], heir["file_path"], heir["duplicate_of"]) == ("queued", "/uploads/a.pdf", None)
+
+@pytest.mark.parametrize("status", ["completed", "failed", "timed_out", "cancelled"])
+def test_finished_job_cannot_be_cancelled(database, status):
+    enqueue("a")
+    with db.connect() as conn:
+        conn.execute("UPDATE jobs SET status = ? WHERE job_id = 'a'", (status,))
+
+    with pytest.raises(JobFinishedError) as raised:
+        task_queue.cancel_job("a")
+    assert raised.value.status == status
+    assert job("a")["status"] == status
+
+def test_unknown_job_cannot_be_cancelled(database):
+    assert task_queue.cancel_job("missing") == (None, None)
+
+def test_cancelled_job_is_not_completed(database):
+    enqueue("a")
+    task_queue.claim_task("worker-1")
+    task_queue.cancel_job("a")
+    task_queue.finish_cancelled_job("a")
+
+    assert task_queue.complete_job("a", None, []) is False
+    assert task_queue.update_job_status("a", "failed") is False
+    assert job("a")["status"] == "cancelled"
+
+def test_completed_job_is_not_cancelled(database):
+    enqueue("a", "/uploads/a.pdf")
+    add_duplicate("b", "a", "2030-01-01T00:00:00")
+    task_queue.claim_task("worker-1")
+    task_queue.cancel_job("a")
+
+    assert task_queue.complete_job("a", None, []) is True
+    assert task_queue.finish_cancelled_job("a") is None
+    assert job("a")["status"] == "completed"
+    assert job("b")["status"] == "completed"
+
+def test_deferred_job_is_claimed_again_with_its_deferrals(database):
+    enqueue("a")
+    assert task_queue.claim_task("worker-1")["deferrals"] == 0
+    task_queue.defer_job("a", time.time() - 1, "acme")
+    task_queue.requeue_deferred_jobs()
+
+    task = task_queue.claim_task("worker-1")
+    assert (task["attempt"], task["deferrals"], task["org_username"]) == (1, 1, "acme")
@@ -1,9 +1,10 @@
 import streamlit as st
 import requests
-import time
+from requests.adapters import HTTPAdapter
 import json
 import os
 from datetime import datetime
+from typing import Dict, List, Optional
 import pandas as pd
 
 # Configure Streamlit page
@@ -16,9 +17,31 @@ st.set_page_config(
 # API Configuration - Force production URL for Streamlit Cloud
 API_BASE_URL = "https://lunartree-backendtask.onrender.com"
 
+API_TIMEOUT = 10  # Seconds per API request
+API_POOL_SIZE = 10  # Keep-alive connections shared by all sessions of this app
+JOB_STATUS_TTL = 2  # Seconds a batch status response is reused across reruns and sessions
+QUEUE_STATUS_TTL = 5
+AUTO_REFRESH_SECONDS = 10
+MAX_BATCH_STATUS_IDS = 1000  # Per batch-status request, as enforced by the API
+
+# Jobs in these states never change again, so they are not polled
+FINAL_STATUSES = ("completed", "failed", "timed_out", "cancelled")
+
 # Debug: Show API URL at startup
 print(f"DEBUG: Using API_BASE_URL = {API_BASE_URL}")
 
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One keep-alive HTTP session for every rerun and browser session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def api_request(method: str, path: str, **kwargs) -> requests.Response:
+    return get_session().request(method, f"{API_BASE_URL}{path}", timeout=API_TIMEOUT, **kwargs)
+
 def upload_pdf(file):
     """Upload PDF to the API and return job ID."""
     files = {"file": ("document.pdf", file, "application/pdf")}
@@ -28,7 +51,7 @@ def upload_pdf(file):
     st.write(f"🔍 DEBUG: Uploading to {url}")
     
     try:
-        response = requests.post(url, files=files)
+        response = api_request("POST", "/api/documents/upload", files=files)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -36,37 +59,82 @@ def upload_pdf(file):
         st.error(f"Attempted URL: {url}")
         return None
 
+# Cached fetches raise on failure (errors are not cached) and the callers
+# show the error, so a failed request is retried on the next rerun.
+
+@st.cache_data(ttl=JOB_STATUS_TTL, show_spinner=False)
+def fetch_job_statuses(job_ids: tuple) -> Dict[str, Dict]:
+    """Status of many jobs with one batch-status request per MAX_BATCH_STATUS_IDS ids."""
+    jobs = {}
+    for start in range(0, len(job_ids), MAX_BATCH_STATUS_IDS):
+        response = api_request(
+            "POST", "/api/jobs/batch-status", json={"job_ids": list(job_ids[start:start + MAX_BATCH_STATUS_IDS])}
+        )
+        response.raise_for_status()
+        jobs.update((job["job_id"], job) for job in response.json()["jobs"])
+    return jobs
+
+@st.cache_data(ttl=QUEUE_STATUS_TTL, show_spinner=False)
+def fetch_queue_status() -> Dict:
+    response = api_request("GET", "/api/queue/status")
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def check_api() -> int:
+    return api_request("GET", "/").status_code
+
 def get_job_status(job_id):
     """Get job status from the API."""
-    url = f"{API_BASE_URL}/api/jobs/{job_id}"
-    
     try:
-        response = requests.get(url)
-        if response.status_code == 404:
-            return None
-        response.raise_for_status()
-        return response.json()
+        return fetch_job_statuses((job_id,)).get(job_id)
     except requests.exceptions.RequestException as e:
         st.error(f"Failed to get job status: {str(e)}")
-        st.error(f"Attempted URL: {url}")
+        st.error(f"Attempted URL: {API_BASE_URL}/api/jobs/batch-status")
         return None
 
 def get_queue_status():
     """Get queue status from the API."""
-    url = f"{API_BASE_URL}/api/queue/status"
-    
-    # Debug: Show URL being used
-    st.write(f"🔍 DEBUG: Getting queue status from {url}")
-    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return fetch_queue_status()
     except requests.exceptions.RequestException as e:
         st.error(f"Failed to get queue status: {str(e)}")
-        st.error(f"Attempted URL: {url}")
+        st.error(f"Attempted URL: {API_BASE_URL}/api/queue/status")
         return None
 
+def tracked_jobs() -> Dict[str, Optional[Dict]]:
+    """Jobs uploaded in this browser session: job_id -> last known job data, oldest first."""
+    if "jobs" not in st.session_state:
+        st.session_state.jobs = {}
+    return st.session_state.jobs
+
+def track_job(job_id: str):
+    tracked_jobs().setdefault(job_id, None)
+
+def refresh_tracked_jobs() -> List[str]:
+    """
+    Fetch the jobs that can still change, in one batch request, and store
+    them. Returns the IDs whose status or results changed since the last
+    refresh.
+    """
+    jobs = tracked_jobs()
+    pending = tuple(job_id for job_id, job in jobs.items() if job is None or job["status"] not in FINAL_STATUSES)
+    if not pending:
+        return []
+    try:
+        latest = fetch_job_statuses(pending)
+    except requests.exceptions.RequestException as e:
+        st.error(f"Failed to get job status: {str(e)}")
+        return []
+    
+    changed = []
+    for job_id in pending:
+        job = latest.get(job_id)
+        if job is not None and job != jobs[job_id]:
+            jobs[job_id] = job
+            changed.append(job_id)
+    return changed
+
 def format_timestamp(timestamp_str):
     """Format timestamp for display."""
     try:
@@ -83,8 +151,11 @@ def display_job_card(job_data):
     status_colors = {
         "queued": "🔵",
         "processing": "🟡", 
+        "deferred": "🟠",
         "completed": "🟢",
-        "failed": "🔴"
+        "failed": "🔴",
+        "timed_out": "🔴",
+        "cancelled": "⚫"
     }
     
     status_icon = status_colors.get(status, "⚪")
@@ -123,9 +194,29 @@ def display_job_card(job_data):
                     st.warning("No GitHub organization found in the PDF")
         
         with col2:
-            if status in ["queued", "processing"]:
+            if status not in FINAL_STATUSES:
                 st.button("🔄 Refresh", key=f"refresh_{job_data['job_id']}")
 
+def display_job_cards(jobs: List[Dict]):
+    for i, job_data in enumerate(jobs):
+        display_job_card(job_data)
+        if i < len(jobs) - 1:
+            st.divider()
+
+def show_active_jobs(job_ids: tuple):
+    """
+    Poll and list this session's unfinished jobs, newest first. Runs as a
+    fragment, so each poll re-renders only these cards; a job that finishes
+    triggers one full rerun that moves it to the finished list.
+    """
+    changed = refresh_tracked_jobs()
+    jobs = tracked_jobs()
+    if any(jobs[job_id]["status"] in FINAL_STATUSES for job_id in changed):
+        st.rerun()
+    if changed:
+        st.caption(f"{len(changed)} job(s) updated at {datetime.now():%H:%M:%S}")
+    display_job_cards([jobs[job_id] for job_id in reversed(job_ids) if jobs.get(job_id) is not None])
+
 def main():
     # Header
     st.title("📄 PDF GitHub Organization Extractor")
@@ -141,6 +232,7 @@ def main():
         st.write(f"**API Endpoint:** {API_BASE_URL}")
         
         if st.button("🔄 Refresh Status"):
+            fetch_queue_status.clear()
             st.rerun()
         
         queue_status = get_queue_status()
@@ -154,7 +246,8 @@ def main():
                 stats = queue_status["job_statistics"]
                 
                 for status, count in stats.items():
-                    icon = {"queued": "🔵", "processing": "🟡", "completed": "🟢", "failed": "🔴"}.get(status, "⚪")
+                    icon = {"queued": "🔵", "processing": "🟡", "deferred": "🟠", "completed": "🟢",
+                            "failed": "🔴", "timed_out": "🔴", "cancelled": "⚫"}.get(status, "⚪")
                     st.metric(f"{icon} {status.title()}", count)
     
     # Main content area
@@ -185,11 +278,7 @@ def main():
                     st.json(result)
                     
                     # Store job ID in session state for tracking
-                    if "job_ids" not in st.session_state:
-                        st.session_state.job_ids = []
-                    
-                    if result["job_id"] not in st.session_state.job_ids:
-                        st.session_state.job_ids.append(result["job_id"])
+                    track_job(result["job_id"])
                     
                     st.info("💡 Switch to the 'Job History' tab to monitor progress")
     
@@ -207,42 +296,32 @@ def main():
                     st.error("Job not found")
         
         # Display tracked jobs
-        if "job_ids" in st.session_state and st.session_state.job_ids:
+        if tracked_jobs():
             st.subheader("Your Jobs")
             
             # Auto-refresh option
-            auto_refresh = st.checkbox("🔄 Auto-refresh every 10 seconds")
+            auto_refresh = st.checkbox(f"🔄 Auto-refresh every {AUTO_REFRESH_SECONDS} seconds")
             
-            if auto_refresh:
-                # Auto-refresh placeholder
-                placeholder = st.empty()
-                
-                # Display jobs with auto-refresh
-                for i, job_id in enumerate(reversed(st.session_state.job_ids)):
-                    job_data = get_job_status(job_id)
-                    if job_data:
-                        with placeholder.container():
-                            display_job_card(job_data)
-                            if i < len(st.session_state.job_ids) - 1:
-                                st.divider()
-                
-                # Auto-refresh
-                time.sleep(10)
-                st.rerun()
-            else:
-                # Display jobs without auto-refresh
-                for i, job_id in enumerate(reversed(st.session_state.job_ids)):
-                    job_data = get_job_status(job_id)
-                    if job_data:
-                        display_job_card(job_data)
-                        if i < len(st.session_state.job_ids) - 1:
-                            st.divider()
+            # Unfinished jobs are a fragment that reruns on its own timer
+            # without rerunning (or blocking) the rest of the page; finished
+            # jobs never change, so they are drawn only when the page runs
+            active = tuple(
+                job_id for job_id, job in tracked_jobs().items() if job is None or job["status"] not in FINAL_STATUSES
+            )
+            if active:
+                st.fragment(show_active_jobs, run_every=AUTO_REFRESH_SECONDS if auto_refresh else None)(active)
+            finished = [
+                job for job in reversed(tracked_jobs().values()) if job is not None and job["status"] in FINAL_STATUSES
+            ]
+            if active and finished:
+                st.divider()
+            display_job_cards(finished)
         else:
             st.info("No jobs found. Upload a PDF to get started!")
             
         # Clear history button
         if st.button("🗑️ Clear Job History"):
-            st.session_state.job_ids = []
+            st.session_state.jobs = {}
             st.success("Job history cleared!")
             st.rerun()
 
@@ -264,8 +343,7 @@ if __name__ == "__main__":
         test_url = f"{API_BASE_URL}/"
         st.write(f"🔍 DEBUG: Testing connection to {test_url}")
         
-        response = requests.get(test_url)
-        if response.status_code != 200:
+        if check_api() != 200:
             st.error(f"⚠️ Cannot connect to API at {API_BASE_URL}")
             st.info("Please check if the FastAPI server is running")
         else:
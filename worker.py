@@ -0,0 +1,58 @@
+"""
+Standalone queue worker.
+
+Runs the worker pool without the API so processing can scale separately:
+
+    python worker.py --concurrency 8 --metrics-port 9100
+
+Any number of worker processes (and API processes started with
+RUN_WORKERS=false) can share one jobs.db and uploads/ directory; jobs are
+claimed atomically from the database.
+"""
+import argparse
+import asyncio
+import os
+import signal
+from pathlib import Path
+
+import db
+import extraction_pool
+import metrics
+import task_queue
+
+# Must match the API's, since migrations of older databases resolve queued files against it
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
+
+async def run(concurrency: int):
+    await db.run(db.init_db, UPLOAD_DIR)
+    await task_queue.start_worker(concurrency)
+    print(f"Worker {task_queue.WORKER_ID} running with {concurrency} workers")
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    
+    print(f"Worker {task_queue.WORKER_ID} shutting down")
+    await task_queue.stop_worker()
+    db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued PDF jobs")
+    parser.add_argument("--concurrency", type=int, default=task_queue.WORKER_CONCURRENCY,
+                        help="Jobs processed concurrently by this process")
+    parser.add_argument("--extraction-processes", type=int, default=None,
+                        help="Size of the PDF extraction process pool")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this port at /metrics")
+    args = parser.parse_args()
+    
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+    if args.extraction_processes:
+        extraction_pool.EXTRACTION_PROCESSES = args.extraction_processes
+    asyncio.run(run(args.concurrency))
+
+if __name__ == "__main__":
+    main()